@@ -10,6 +10,7 @@ from .i18n import set_language, get_string
 from .constants import PYTHON_DIR
 from .utils import log, clear_console, kill_adb_server, kill_adb_processes, enable_console_log_capture, TerminalMenu, hide_console_cursor, install_input_cursor_guard
 from . import downloader
+from .provisioning import run_provisioning
 
 
 
@@ -242,6 +243,7 @@ def _open_qna_page() -> None:
 
 def _check_for_updates(interactive: bool) -> None:
     from .constants import APP_VERSION
+    from .download_store import DigestMismatchError
     from . import utils
     current_version = APP_VERSION
     try:
@@ -296,9 +298,9 @@ def _check_for_updates(interactive: bool) -> None:
                                             updates_dir.mkdir(parents=True, exist_ok=True)
                                             dest = updates_dir / name
                                             print(f'Downloading update: {name}')
-                                            utils.download_url(url, dest)
-                                            actual = utils.sha256_file(dest)
-                                            if expected and actual.lower() != expected.lower():
+                                            try:
+                                                utils.download_url(url, dest, sha256=expected)
+                                            except DigestMismatchError:
                                                 print('[!] Checksum mismatch. Please re-download the update file.')
                                             else:
                                                 print(f'Downloaded: {dest}')
@@ -361,6 +363,8 @@ def _driver_status_text(installed: bool) -> str:
 def _additional_options_menu() -> None:
     from .reinstall_flow import run_firmware_reinstall_flow
     from .country_reset_flow import run_country_code_reset_flow
+    from .scatter_preview_flow import run_scatter_preview_flow
+    from .firmware_match_flow import run_firmware_match_flow
     from .mtk_driver import is_mtk_driver_installed
     global _LAST_EXTRA_MENU_CHOICE
     while True:
@@ -376,9 +380,11 @@ def _additional_options_menu() -> None:
         menu.add_option('1', get_string('app.extra.option1'))
         menu.add_option('2', get_string('app.extra.option2'))
         menu.add_option('3', f"{get_string('app.extra.option3')} {skip_status}")
+        menu.add_option('4', get_string('app.extra.option4'))
+        menu.add_option('5', get_string('app.extra.option5'))
         menu.add_label(get_string('app.menu.short_separator'))
-        menu.add_option('4', get_string('app.extra.option7'))
-        menu.add_option('5', f"{get_string('app.extra.option8')}: [{current_language}]")
+        menu.add_option('6', get_string('app.extra.option7'))
+        menu.add_option('7', f"{get_string('app.extra.option8')}: [{current_language}]")
         menu.add_label(get_string('app.menu.short_separator'))
         menu.add_option('x', get_string('app.extra.back'))
         try:
@@ -411,11 +417,23 @@ def _additional_options_menu() -> None:
             data['country_code_feature'] = skip_country
             _save_settings(data)
         elif choice == '4':
+            try:
+                run_scatter_preview_flow()
+            except KeyboardInterrupt:
+                log('app.user_cancel')
+            _pause_back_to_menu()
+        elif choice == '5':
+            try:
+                run_firmware_match_flow()
+            except KeyboardInterrupt:
+                log('app.user_cancel')
+            _pause_back_to_menu()
+        elif choice == '6':
             clear_console()
             print(get_string('app.title'))
             _check_for_updates(interactive=True)
             _pause_back_to_menu()
-        elif choice == '5':
+        elif choice == '7':
             clear_console()
             _choose_language(force_prompt=True)
             return
@@ -558,10 +576,12 @@ def main() -> None:
         return
     _check_for_updates(interactive=False)
     log('bootstrap.dependencies_start')
-    downloader.ensure_platform_tools()
-    downloader.ensure_spflashtool()
-    ok_crypto = downloader.ensure_cryptography()
-    if not ok_crypto:
+    results = run_provisioning([
+        ('platform-tools', downloader.ensure_platform_tools),
+        ('SP Flash Tool', downloader.ensure_spflashtool),
+        ('cryptography', downloader.ensure_cryptography),
+    ])
+    if not results['cryptography']:
         try:
             input(get_string('app.press_enter'))
         except EOFError:
@@ -17,6 +17,9 @@ FLASH_XML_ROOT = IMAGE_DIR / 'flash.xml'
 DA_AUTH_DLAGENT = DOWNLOAD_AGENT_IMAGE_DIR / 'DA_BR.bin'
 DA_AUTH_ROOT = IMAGE_DIR / 'DA_BR.bin'
 LOGS_DIR = BASE_DIR / 'logs'
+CACHE_DIR = TOOLS_DIR / 'cache'
+SCATTER_CACHE_DIR = CACHE_DIR / 'scatter'
+DOWNLOAD_STORE_DIR = CACHE_DIR / 'objects'
 LOG_ENV_VAR = 'MTK_LOG_FILE'
 PLATFORM_TOOLS_URLS = ['https://dl.google.com/android/repository/platform-tools-latest-windows.zip']
 SPFT_ZIP_URLS = ['https://spflashtools.com/wp-content/uploads/SP_Flash_Tool_V6.2404_Win.zip']
@@ -3,6 +3,7 @@ import time
 from . import adb_utils as adb_state
 from .flash_spft import launch_spft_gui, run_firmware_upgrade, prepare_flash_files
 from .firmware_guard import inspect_vendor_boot_image, inspect_flash_xml_platform
+from .image_index import image_folder_ready
 from .global_flow import _cleanup_after_flow, _cleanup_before_flow, _normalize_rom_region
 from .port_scan import wait_for_preloader
 from .proinfo_country import wait_and_patch_proinfo
@@ -38,7 +39,7 @@ def _detect_platform_country_reset() -> tuple[str, str, str, str] | None:
 def _inspect_image_folder_country_reset(platform: str) -> bool:
     from .constants import IMAGE_DIR
     log('flow.firmware_version_detecting')
-    if not IMAGE_DIR.is_dir() or not (IMAGE_DIR / 'download_agent').is_dir():
+    if not image_folder_ready(IMAGE_DIR):
         log('flow.image_folder_missing')
         return False
     info = inspect_vendor_boot_image()
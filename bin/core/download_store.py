@@ -0,0 +1,129 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from .constants import DOWNLOAD_STORE_DIR
+
+_INDEX_PATH = DOWNLOAD_STORE_DIR / 'index.json'
+_INDEX_VERSION = 1
+_HASH_CHUNK_SIZE = 1 << 20
+_FICLONE = 0x40049409
+_index: dict[str, dict] | None = None
+_index_lock = threading.Lock()
+
+
+class DigestMismatchError(OSError):
+    pass
+
+
+def _object_path(digest: str) -> Path:
+    return DOWNLOAD_STORE_DIR / digest[:2] / digest
+
+
+def _load_index() -> dict[str, dict]:
+    global _index
+    if _index is None:
+        _index = {}
+        try:
+            data = json.loads(_INDEX_PATH.read_text(encoding='utf-8'))
+            if isinstance(data, dict) and data.get('version') == _INDEX_VERSION and isinstance(data.get('urls'), dict):
+                _index = {str(k): v for k, v in data['urls'].items() if isinstance(v, dict)}
+        except Exception:
+            pass
+    return _index
+
+
+def _store_index(index: dict[str, dict]) -> None:
+    try:
+        DOWNLOAD_STORE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = _INDEX_PATH.with_name(f'{_INDEX_PATH.name}.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps({'version': _INDEX_VERSION, 'urls': index}, indent=2), encoding='utf-8')
+        os.replace(tmp, _INDEX_PATH)
+    except OSError:
+        pass
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open('rb') as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _object_ok(digest: str, size: int | None = None) -> Path | None:
+    path = _object_path(digest)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if size is not None and st.st_size != size:
+        return None
+    if st.st_nlink > 1:
+        try:
+            if _hash_file(path) != digest:
+                return None
+        except OSError:
+            return None
+    return path
+
+
+def lookup(url: str, sha256: str | None = None) -> tuple[str, Path] | None:
+    expected = (sha256 or '').lower()
+    if expected:
+        path = _object_ok(expected)
+        if path is not None:
+            return expected, path
+    entry = _load_index().get(url)
+    if not entry:
+        return None
+    digest = str(entry.get('sha256') or '').lower()
+    if not digest or (expected and digest != expected):
+        return None
+    path = _object_ok(digest, entry.get('size'))
+    return (digest, path) if path is not None else None
+
+
+def insert(path: Path, url: str, sha256: str | None = None, digest: str | None = None) -> tuple[str, Path]:
+    digest = (digest or _hash_file(path)).lower()
+    if sha256 and digest != sha256.lower():
+        try:
+            path.unlink()
+        except OSError:
+            pass
+        raise DigestMismatchError(f'sha256 mismatch for {url}: expected {sha256.lower()}, got {digest}')
+    size = path.stat().st_size
+    target = _object_path(digest)
+    if _object_ok(digest, size) is not None:
+        path.unlink()
+    else:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(path, target)
+    with _index_lock:
+        index = _load_index()
+        index[url] = {'sha256': digest, 'size': size}
+        _store_index(index)
+    return digest, target
+
+
+def _clone_file(src: Path, dest: Path) -> None:
+    import fcntl
+    with src.open('rb') as fsrc, dest.open('wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+
+
+def link_into(src: Path, dest: Path) -> None:
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f'{dest.name}.{os.getpid()}.link')
+    try:
+        tmp.unlink()
+    except OSError:
+        pass
+    try:
+        _clone_file(src, tmp)
+    except (ImportError, OSError):
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
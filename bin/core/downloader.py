@@ -1,125 +1,51 @@
+import json
+import os
 import platform
-import sys
 import shutil
 import subprocess
 import zipfile
-import tempfile
-import time
 from pathlib import Path
 from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
-from .constants import TOOLS_DIR, TOOLS_DOWNLOAD_DIR, PLATFORM_TOOLS_DIR, PLATFORM_TOOLS_URLS, SPFT_ZIP_URLS, PYTHON_DIR, PYTHON_VERSION, PYTHON_EMBED_URL_TEMPLATE, PYTHON_PTH_FILENAME, GET_PIP_URL, REQUIRED_PYTHON_PACKAGES, SPFT_EXE, LKDTBO_DIR, LKDTBO_MODEL_TO_ZIP, LKDTBO_GITHUB_COMMIT, LKDTBO_ZIP_URLS
-from .utils import log, get_term_width
+from urllib.parse import urlsplit
+from .constants import CACHE_DIR, TOOLS_DIR, TOOLS_DOWNLOAD_DIR, PLATFORM_TOOLS_DIR, PLATFORM_TOOLS_URLS, SPFT_ZIP_URLS, PYTHON_DIR, PYTHON_VERSION, PYTHON_EMBED_URL_TEMPLATE, PYTHON_PTH_FILENAME, GET_PIP_URL, REQUIRED_PYTHON_PACKAGES, SPFT_EXE, LKDTBO_DIR, LKDTBO_MODEL_TO_ZIP, LKDTBO_GITHUB_COMMIT, LKDTBO_ZIP_URLS
+from .utils import log, sha256_file
+from . import download_store
+from .http_download import MirrorSample, download_file, rank_mirrors, record_mirror_result
+from .zip_extract import extract_zip
  
-def _download_file(url: str, dest: Path) -> None:
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    req = Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-    with urlopen(req, timeout=600) as resp:
-        total = 0
-        try:
-            total = int(resp.headers.get('Content-Length') or 0)
-        except Exception:
-            total = 0
-        done = 0
-        start = time.time()
-        last_draw = 0.0
-        ncols = get_term_width(108)
+_LKDTBO_CACHE_DIR = CACHE_DIR / 'lkdtbo'
+_LKDTBO_TARGETS = ('lk_a', 'lk_b', 'dtbo_a', 'dtbo_b')
+_LKDTBO_DIGESTS_PATH = _LKDTBO_CACHE_DIR / 'digests.json'
 
-        def fmt_bytes(n: int) -> str:
-            units = ['B', 'K', 'M', 'G', 'T']
-            v = float(n)
-            u = 0
-            while v >= 1024.0 and u < len(units) - 1:
-                v /= 1024.0
-                u += 1
-            if u == 0:
-                return f'{int(v)}{units[u]}'
-            if v >= 100:
-                return f'{v:.0f}{units[u]}'
-            if v >= 10:
-                return f'{v:.1f}{units[u]}'
-            return f'{v:.2f}{units[u]}'
+def _download_file(url: str, dest: Path, head: MirrorSample | None = None) -> str:
+    return download_file(url, dest, user_agent='Mozilla/5.0', head=head)
 
-        def fmt_time(sec: float) -> str:
-            s = int(sec + 0.5)
-            m, s = divmod(s, 60)
-            h, m = divmod(m, 60)
-            if h > 0:
-                return f'{h:02d}:{m:02d}:{s:02d}'
-            return f'{m:02d}:{s:02d}'
-
-        def draw(final: bool = False) -> None:
-            nonlocal last_draw
-            now = time.time()
-            if (not final) and (now - last_draw) < 0.06:
-                return
-            last_draw = now
-            if total <= 0:
-                return
-            pct = done / total if total else 0.0
-            if pct < 0.0:
-                pct = 0.0
-            if pct > 1.0:
-                pct = 1.0
-            percent = int(pct * 100.0 + 0.5)
-            elapsed = now - start
-            rate = done / elapsed if elapsed > 0 else 0.0
-            remaining = (total - done) / rate if rate > 0 else 0.0
-            l_bar = f'{percent:3d}%|'
-            r_bar = f'| {fmt_bytes(done)}/{fmt_bytes(total)} [{fmt_time(elapsed)}<{fmt_time(remaining)}]'
-            bar_width = ncols - len(l_bar) - len(r_bar)
-            if bar_width < 10:
-                bar_width = 10
-            filled = int(bar_width * pct + 0.5)
-            if filled < 0:
-                filled = 0
-            if filled > bar_width:
-                filled = bar_width
-            bar = ('█' * filled) + (' ' * (bar_width - filled))
-            line = (l_bar + bar + r_bar).ljust(ncols)
-            try:
-                out = sys.stdout
-                prev = getattr(out, '_lpmbox_suppress_capture', False)
-                setattr(out, '_lpmbox_suppress_capture', True)
-                try:
-                    out.write('\r' + line)
-                    if final:
-                        out.write('\n')
-                    out.flush()
-                finally:
-                    setattr(out, '_lpmbox_suppress_capture', prev)
-            except Exception:
-                pass
 
-        with dest.open('wb') as f:
-            while True:
-                chunk = resp.read(1024 * 64)
-                if not chunk:
-                    break
-                f.write(chunk)
-                done += len(chunk)
-                draw(False)
-        if total > 0:
-            done = total
-            draw(True)
-
-
-def _download_from_list(urls: list[str], dest: Path) -> None:
+def _download_from_list(urls: list[str], dest: Path) -> str:
     last_error: Exception | None = None
     for url in urls:
+        hit = download_store.lookup(url, None)
+        if hit is not None:
+            download_store.link_into(hit[1], dest)
+            return hit[0]
+    ordered, head = rank_mirrors(urls, user_agent='Mozilla/5.0', dest=dest)
+    if len(ordered) > 1:
+        log('dl.mirror_selected', host=urlsplit(ordered[0]).netloc)
+    for url in ordered:
         try:
-            _download_file(url, dest)
-            return
+            return _download_file(url, dest, head)
         except (URLError, HTTPError, OSError) as e:
+            record_mirror_result(url, None)
             last_error = e
+        head = None
     log('dl.download_failed')
     if last_error is not None:
         raise last_error
 
-def _extract_zip(zip_path: Path, dest_dir: Path) -> None:
-    dest_dir.mkdir(parents=True, exist_ok=True)
-    with zipfile.ZipFile(zip_path, 'r') as zf:
-        zf.extractall(dest_dir)
+def _extract_zip(zip_path: Path, dest_dir: Path, strip_prefix: str = '') -> None:
+    written, skipped = extract_zip(zip_path, dest_dir, strip_prefix)
+    if skipped:
+        log('dl.extract_up_to_date', skipped=skipped, total=written + skipped)
 
 def _detect_arch() -> str:
     name = platform.machine().lower()
@@ -174,11 +100,11 @@ def ensure_python_embed() -> Path | None:
         return None
     return exe
 
-def ensure_platform_tools() -> None:
+def ensure_platform_tools() -> bool:
     adb = PLATFORM_TOOLS_DIR / 'adb.exe'
     if adb.is_file():
         log('dl.pt_skip')
-        return
+        return True
     zip_path = TOOLS_DOWNLOAD_DIR / 'platform-tools.zip'
     log('dl.pt_downloading')
     _download_from_list(PLATFORM_TOOLS_URLS, zip_path)
@@ -186,6 +112,8 @@ def ensure_platform_tools() -> None:
     _extract_zip(zip_path, TOOLS_DIR)
     if adb.is_file():
         log('dl.pt_ready', path=str(PLATFORM_TOOLS_DIR))
+        return True
+    return False
 
 def _find_file_recursively(root: Path, name: str) -> Path | None:
     for path in root.rglob(name):
@@ -210,24 +138,7 @@ def ensure_spflashtool() -> bool:
             log('dl.download_failed')
             return False
     log('dl.spft_extracting')
-    _extract_zip(zip_path, TOOLS_DIR)
-    extracted_dir = TOOLS_DIR / 'SP_Flash_Tool_V6.2404_Win'
-    if extracted_dir.is_dir():
-        for item in extracted_dir.iterdir():
-            dest = TOOLS_DIR / item.name
-            try:
-                if dest.exists():
-                    if dest.is_file():
-                        dest.unlink()
-                    elif dest.is_dir():
-                        shutil.rmtree(dest)
-                shutil.move(str(item), str(dest))
-            except Exception:
-                pass
-        try:
-            shutil.rmtree(extracted_dir)
-        except Exception:
-            pass
+    _extract_zip(zip_path, TOOLS_DIR, strip_prefix='SP_Flash_Tool_V6.2404_Win')
     if SPFT_EXE.is_file():
         log('dl.spft_ready', path=str(SPFT_EXE))
         return True
@@ -271,39 +182,88 @@ def ensure_lkdtbo_zip_for_model(model: str) -> Path | None:
         f'https://github.com/dwas-KR/LPMBox/raw/{LKDTBO_GITHUB_COMMIT}/{name}',
     ])
     try:
-        _download_from_list(urls, dest)
+        digest = _download_from_list(urls, dest)
     except Exception:
         return None
+    _remember_zip_digest(dest, digest)
     return dest
 
-def extract_lkdtbo_zip(zip_path: Path, dest_dir: Path | None=None) -> bool:
+def _load_zip_digests() -> dict[str, dict]:
+    try:
+        data = json.loads(_LKDTBO_DIGESTS_PATH.read_text(encoding='utf-8'))
+    except Exception:
+        return {}
+    return {str(k): v for k, v in data.items() if isinstance(v, dict)} if isinstance(data, dict) else {}
+
+def _remember_zip_digest(path: Path, digest: str) -> None:
+    try:
+        st = os.stat(path)
+        digests = _load_zip_digests()
+        digests[os.path.normcase(os.path.abspath(path))] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+        _LKDTBO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = _LKDTBO_DIGESTS_PATH.with_name(f'{_LKDTBO_DIGESTS_PATH.name}.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps(digests, indent=2), encoding='utf-8')
+        os.replace(tmp, _LKDTBO_DIGESTS_PATH)
+    except OSError:
+        pass
+
+def _zip_digest(path: Path) -> str:
+    st = os.stat(path)
+    entry = _load_zip_digests().get(os.path.normcase(os.path.abspath(path))) or {}
+    if entry.get('sha256') and entry.get('size') == st.st_size and entry.get('mtime_ns') == st.st_mtime_ns:
+        return str(entry['sha256'])
+    digest = sha256_file(path)
+    _remember_zip_digest(path, digest)
+    return digest
+
+def _lkdtbo_member_index(zf: zipfile.ZipFile) -> dict[str, zipfile.ZipInfo]:
+    wanted = {}
+    for t in _LKDTBO_TARGETS:
+        for name in (t, f'{t}.img', f'{t}.bin'):
+            wanted[name] = t
+    index: dict[str, zipfile.ZipInfo] = {}
+    for info in zf.infolist():
+        if info.is_dir():
+            continue
+        t = wanted.get(info.filename.replace('\\', '/').rsplit('/', 1)[-1].lower())
+        if t is not None:
+            index.setdefault(t, info)
+    return index
+
+def _unpack_lkdtbo(zip_path: Path, cache_dir: Path) -> bool:
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        index = _lkdtbo_member_index(zf)
+        if len(index) != len(_LKDTBO_TARGETS):
+            return False
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for t, info in index.items():
+            tmp = cache_dir / f'{t}.{os.getpid()}.tmp'
+            with zf.open(info) as src, tmp.open('wb') as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+            os.replace(tmp, cache_dir / t)
+    return True
+
+def extract_lkdtbo_zip(zip_path: Path, dest_dir: Path | None=None, also_to: tuple[Path, ...]=()) -> bool:
     if dest_dir is None:
         dest_dir = LKDTBO_DIR
-    dest_dir.mkdir(parents=True, exist_ok=True)
-    targets = ['lk_a', 'lk_b', 'dtbo_a', 'dtbo_b']
-    for t in targets:
-        p = dest_dir / t
-        if p.exists():
-            try:
-                p.unlink()
-            except OSError:
-                pass
+    dest_dirs = [dest_dir, *also_to]
+    for d in dest_dirs:
+        d.mkdir(parents=True, exist_ok=True)
+        for t in _LKDTBO_TARGETS:
+            p = d / t
+            if p.exists():
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
     try:
-        with tempfile.TemporaryDirectory() as td:
-            tmp = Path(td)
-            _extract_zip(zip_path, tmp)
-            for t in targets:
-                found = None
-                for p in tmp.rglob('*'):
-                    if not p.is_file():
-                        continue
-                    n = p.name.lower()
-                    if n == t.lower() or n == f'{t}.img' or n == f'{t}.bin':
-                        found = p
-                        break
-                if found is None:
-                    return False
-                shutil.copy2(found, dest_dir / t)
+        cache_dir = _LKDTBO_CACHE_DIR / _zip_digest(zip_path)
+        if not all((cache_dir / t).is_file() for t in _LKDTBO_TARGETS):
+            if not _unpack_lkdtbo(zip_path, cache_dir):
+                return False
+        for d in dest_dirs:
+            for t in _LKDTBO_TARGETS:
+                download_store.link_into(cache_dir / t, d / t)
     except Exception:
         return False
     return True
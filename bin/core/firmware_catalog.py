@@ -0,0 +1,260 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from .constants import CACHE_DIR, FLASH_XML_DLAGENT
+from .utils import log
+from .firmware_guard import _version_key, inspect_flash_xml_platform, inspect_vendor_boot_image, is_firmware_version_blocked, store_inspections
+
+CATALOG_PATH = CACHE_DIR / 'firmware_catalog.json'
+_CATALOG_VERSION = 1
+_MAX_SCAN_DEPTH = 4
+_VENDOR_BOOT_NAME = 'vendor_boot-debug.img'
+_DOWNLOAD_AGENT_NAME = FLASH_XML_DLAGENT.parent.name
+
+
+class CatalogEntry:
+    __slots__ = ('path', 'model', 'version', 'region', 'platform', 'blocked', 'stamp')
+
+    def __init__(self, path: str, model: str, version: str, region: str, platform: str, blocked: bool = False, stamp: list[int] | None = None) -> None:
+        self.path = path
+        self.model = model
+        self.version = version
+        self.region = region
+        self.platform = platform
+        self.blocked = blocked
+        self.stamp = stamp or []
+
+    @property
+    def key(self) -> tuple[str, str, str, str]:
+        return self.model, self.version, self.region, self.platform
+
+    def sort_key(self) -> tuple:
+        parsed = _version_key(self.version)
+        return (parsed[1] if parsed else (), self.version, self.path)
+
+    def to_dict(self) -> dict[str, object]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> CatalogEntry:
+        return cls(
+            str(data.get('path', '')),
+            str(data.get('model', '')),
+            str(data.get('version', '')),
+            str(data.get('region', '')),
+            str(data.get('platform', '')),
+            bool(data.get('blocked', False)),
+            [int(v) for v in data.get('stamp') or []],
+        )
+
+
+class FirmwareCatalog:
+    def __init__(self, root: str = '', entries: list[CatalogEntry] | None = None) -> None:
+        self.root = root
+        self.entries = sorted(entries or [], key=CatalogEntry.sort_key, reverse=True)
+        self.by_path = {entry.path: entry for entry in self.entries}
+        self.by_key: dict[tuple[str, str, str, str], list[CatalogEntry]] = {}
+        self.by_model: dict[str, list[CatalogEntry]] = {}
+        for entry in self.entries:
+            self.by_key.setdefault(entry.key, []).append(entry)
+            self.by_model.setdefault(entry.model, []).append(entry)
+
+    def find(self, model: str, region: str = '', platform: str = '', version: str = '', include_blocked: bool = False) -> list[CatalogEntry]:
+        model = (model or '').strip().upper()
+        region = (region or '').strip().upper()
+        platform = (platform or '').strip().upper()
+        version = (version or '').strip().upper()
+        if model and version and region and platform:
+            candidates = self.by_key.get((model, version, region, platform), [])
+        else:
+            candidates = self.by_model.get(model, []) if model else self.entries
+        return [
+            entry
+            for entry in candidates
+            if (not region or entry.region == region)
+            and (not platform or entry.platform == platform)
+            and (not version or entry.version == version)
+            and (include_blocked or not entry.blocked)
+        ]
+
+    def best_match(self, model: str, region: str = '', platform: str = '') -> CatalogEntry | None:
+        candidates = self.find(model, platform=platform)
+        if not candidates:
+            return None
+        region = (region or '').strip().upper()
+        same_region = [entry for entry in candidates if entry.region == region]
+        return (same_region or candidates)[0]
+
+    def save(self, path: Path = CATALOG_PATH) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        payload = {
+            'version': _CATALOG_VERSION,
+            'root': self.root,
+            'entries': [entry.to_dict() for entry in self.entries],
+        }
+        tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path = CATALOG_PATH) -> FirmwareCatalog:
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except Exception:
+            return cls()
+        if not isinstance(data, dict) or data.get('version') != _CATALOG_VERSION:
+            return cls()
+        entries = [CatalogEntry.from_dict(item) for item in data.get('entries') or [] if isinstance(item, dict)]
+        return cls(str(data.get('root') or ''), entries)
+
+
+def _package_stamp(package: Path) -> list[int] | None:
+    stamp: list[int] = []
+    for path in (package / _VENDOR_BOOT_NAME, package / _DOWNLOAD_AGENT_NAME / FLASH_XML_DLAGENT.name):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamp += [st.st_size, st.st_mtime_ns]
+    return stamp
+
+
+def find_firmware_packages(root: Path, max_depth: int = _MAX_SCAN_DEPTH) -> list[Path]:
+    found: list[Path] = []
+    stack: list[tuple[str, int]] = [(str(root), 0)]
+    while stack:
+        directory, depth = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        names = {os.path.normcase(entry.name): entry for entry in entries}
+        agent = names.get(os.path.normcase(_DOWNLOAD_AGENT_NAME))
+        if os.path.normcase(_VENDOR_BOOT_NAME) in names and agent is not None and agent.is_dir():
+            found.append(Path(directory))
+            continue
+        if depth >= max_depth:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, depth + 1))
+            except OSError:
+                continue
+    return sorted(found)
+
+
+def _inspect_package(package: str) -> tuple[CatalogEntry, dict[str, dict[str, str]]]:
+    image_dir = Path(package)
+    fresh: dict[str, dict[str, str]] = {}
+    info = inspect_vendor_boot_image(image_dir, fresh)
+    entry = CatalogEntry(
+        package,
+        (info.get('model') or '').strip().upper(),
+        (info.get('version') or '').strip().upper(),
+        (info.get('rom_region') or '').strip().upper(),
+        (inspect_flash_xml_platform(image_dir) or '').strip().upper(),
+        stamp=_package_stamp(image_dir),
+    )
+    return entry, fresh
+
+
+def scan_firmware_library(root: Path, workers: int | None = None, previous: FirmwareCatalog | None = None) -> FirmwareCatalog:
+    packages = find_firmware_packages(root)
+    previous = previous or FirmwareCatalog()
+    entries: list[CatalogEntry] = []
+    pending: list[str] = []
+    for package in packages:
+        known = previous.by_path.get(str(package))
+        if known is not None and known.stamp and known.stamp == _package_stamp(package):
+            entries.append(known)
+        else:
+            pending.append(str(package))
+    inspected: list[tuple[CatalogEntry, dict[str, dict[str, str]]]] = []
+    if len(pending) > 1 and workers != 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                inspected = list(pool.map(_inspect_package, pending, chunksize=max(1, len(pending) // 32)))
+            pending = []
+        except Exception:
+            inspected = []
+    inspected += [_inspect_package(package) for package in pending]
+    fresh: dict[str, dict[str, str]] = {}
+    for entry, found in inspected:
+        entries.append(entry)
+        fresh.update(found)
+    store_inspections(fresh)
+    for entry in entries:
+        entry.blocked = bool(entry.model and entry.version) and is_firmware_version_blocked(entry.model, entry.version, entry.region)
+    return FirmwareCatalog(str(root), entries)
+
+
+def connected_device() -> tuple[str, str, str] | None:
+    from .adb_utils import adb_shell_getprop
+    from .global_flow import _normalize_rom_region
+    from .utils import normalize_model_name
+    raw_model = adb_shell_getprop('ro.product.model').strip()
+    if not raw_model:
+        return None
+    region = _normalize_rom_region(adb_shell_getprop('ro.config.zui.region') or '')
+    platform = (adb_shell_getprop('ro.vendor.mediatek.platform') or '').strip().upper()
+    return normalize_model_name(raw_model), region, platform
+
+
+def _format_entry(entry: CatalogEntry) -> str:
+    flag = 'BLOCKED' if entry.blocked else ''
+    return f'{entry.model or "?":<8} {entry.version or "?":<24} {entry.region or "?":<4} {entry.platform or "?":<7} {flag:<7} {entry.path}'
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m core.firmware_catalog')
+    sub = parser.add_subparsers(dest='command', required=True)
+    scan = sub.add_parser('scan', help='inspect every firmware package under a library root')
+    scan.add_argument('root')
+    scan.add_argument('--workers', type=int, default=None)
+    scan.add_argument('--full', action='store_true', help='ignore previous results and reinspect every package')
+    find = sub.add_parser('find', help='list catalog entries')
+    find.add_argument('--model', default='')
+    find.add_argument('--region', default='')
+    find.add_argument('--platform', default='')
+    find.add_argument('--version', default='')
+    find.add_argument('--all', action='store_true', help='include blocked firmware')
+    sub.add_parser('match', help='pick the package for the tablet connected over adb')
+    args = parser.parse_args(argv)
+    if args.command == 'scan':
+        previous = None if args.full else FirmwareCatalog.load()
+        catalog = scan_firmware_library(Path(args.root), args.workers, previous)
+        catalog.save()
+        for entry in catalog.entries:
+            print(_format_entry(entry))
+        return 0
+    catalog = FirmwareCatalog.load()
+    if args.command == 'find':
+        for entry in catalog.find(args.model, args.region, args.platform, args.version, args.all):
+            print(_format_entry(entry))
+        return 0
+    return 0 if match_connected_device(catalog) is not None else 1
+
+
+def match_connected_device(catalog: FirmwareCatalog) -> CatalogEntry | None:
+    device = connected_device()
+    if device is None:
+        log('flow.catalog.no_device')
+        return None
+    model, region, platform = device
+    log('flow.catalog.device', model=model, region=region or '?', platform=platform or '?')
+    entry = catalog.best_match(model, region, platform)
+    if entry is None:
+        log('flow.catalog.no_match', model=model, region=region or '?', platform=platform or '?')
+        return None
+    log('flow.catalog.match', version=entry.version, region=entry.region or '?', path=entry.path)
+    return entry
+
+
+if __name__ == '__main__':
+    sys.exit(main())
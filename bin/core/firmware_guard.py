@@ -1,57 +1,184 @@
 from __future__ import annotations
 from pathlib import Path
+import fnmatch
+import json
+import mmap
+import os
 import re
-from .constants import BLOCK_FIRMWARE_INI, IMAGE_DIR, FLASH_XML_DLAGENT, FLASH_XML_ROOT
+from .constants import BLOCK_FIRMWARE_INI, CACHE_DIR, IMAGE_DIR, FLASH_XML_DLAGENT, FLASH_XML_ROOT
+from .image_index import get_image_index, image_folder_ready
 from . import adb_utils as adb_state
 from .utils import log
+from .vendor_boot import read_vendor_boot_props
 
 _VERSION_RE = re.compile(rb'(?:ZUI|ZUXOS)_[0-9]+(?:\.[0-9]+)+_[A-Z]+')
 _MODEL_RE = re.compile(rb'TB\d{3}[A-Z]{2}')
 _FLASH_PLATFORM_RE = re.compile(r'<scatter>\.\./(MT\d+)_Android_scatter\.xml</scatter>', re.IGNORECASE)
+_REGION_ANCHOR = b'_OPEN_USER'
+_VENDOR_BOOT_SCAN_RE = re.compile(
+    rb'[ZTCPO](?='
+    rb'(?<=Z)(?P<version>(?:UI|UXOS)_[0-9]+(?:\.[0-9]+)+_[A-Z]+)'
+    rb'|(?<=T)(?P<model>B\d{3}[A-Z]{2})'
+    rb'|(?P<prc>(?<=C)N|(?<=P)RC)' + _REGION_ANCHOR +
+    rb'|(?<=O)(?P<row>W)' + _REGION_ANCHOR + rb')'
+)
+_VERSION_PROP_KEYS = (
+    'ro.build.display.id', 'ro.vendor.build.display.id', 'ro.build.version.incremental',
+    'ro.vendor.build.version.incremental', 'ro.build.flavor', 'ro.build.description', 'ro.build.fingerprint',
+)
+_MODEL_PROP_KEYS = (
+    'ro.product.vendor.model', 'ro.product.model', 'ro.product.odm.model', 'ro.product.system.model',
+    'ro.product.vendor.name', 'ro.product.name',
+)
+_REGION_PROP_KEY = 'ro.config.zui.region'
+_VERSION_KEY_RE = re.compile(r'^(ZUI|ZUXOS)_([0-9]+(?:\.[0-9]+)*)_([A-Z]+)$')
+_WILDCARD_CHARS = ('*', '?', '[')
+_blocklist_indexes: dict[str, tuple[int, int, 'BlocklistIndex']] = {}
+_INSPECTION_CACHE_PATH = CACHE_DIR / 'inspection.json'
+_INSPECTION_CACHE_VERSION = 2
+_INSPECTION_CACHE_LIMIT = 256
+_inspection_cache: dict[str, dict[str, str]] | None = None
 
 
-def _read_bytes(path: Path) -> bytes | None:
+def _map_file(path: Path) -> mmap.mmap | None:
     try:
-        return path.read_bytes()
-    except Exception:
+        with path.open('rb') as fh:
+            return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+
+def _inspection_key(path: Path) -> str | None:
+    try:
+        st = os.stat(path)
+    except OSError:
         return None
+    return f'{os.path.normcase(os.path.abspath(path))}|{st.st_size}|{st.st_mtime_ns}'
+
 
+def _load_inspection_cache() -> dict[str, dict[str, str]]:
+    global _inspection_cache
+    if _inspection_cache is None:
+        _inspection_cache = {}
+        try:
+            data = json.loads(_INSPECTION_CACHE_PATH.read_text(encoding='utf-8'))
+            if isinstance(data, dict) and data.get('version') == _INSPECTION_CACHE_VERSION:
+                entries = data.get('entries')
+                if isinstance(entries, dict):
+                    _inspection_cache = {
+                        str(key): {str(k): str(v) for k, v in value.items()}
+                        for key, value in entries.items()
+                        if isinstance(value, dict)
+                    }
+        except Exception:
+            pass
+    return _inspection_cache
 
-def _detect_section(data: bytes, version: str | None = None) -> str | None:
-    if b'CN_OPEN_USER' in data or b'PRC_OPEN_USER' in data:
+
+def store_inspections(entries: dict[str, dict[str, str]]) -> None:
+    if not entries:
+        return
+    cache = _load_inspection_cache()
+    for key, info in entries.items():
+        cache.pop(key, None)
+        cache[key] = dict(info)
+    while len(cache) > _INSPECTION_CACHE_LIMIT:
+        cache.pop(next(iter(cache)))
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = _INSPECTION_CACHE_PATH.with_name(f'{_INSPECTION_CACHE_PATH.name}.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps({'version': _INSPECTION_CACHE_VERSION, 'entries': cache}, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp, _INSPECTION_CACHE_PATH)
+    except OSError:
+        pass
+
+
+def _region_section(prc: bool, row: bool, version: str | None) -> str | None:
+    if prc:
         return 'PRC ROM'
-    if b'ROW_OPEN_USER' in data or b'OW_OPEN_USER' in data:
+    if row:
         return 'ROW ROM'
-    if version:
-        up = version.upper()
-        if up.startswith('ZUXOS_'):
-            return 'PRC ROM'
+    if version and version.upper().startswith('ZUXOS_'):
+        return 'PRC ROM'
     return None
 
 
-def _extract_unique(pattern: re.Pattern[bytes], data: bytes) -> list[str]:
-    found: list[str] = []
-    for match in pattern.findall(data):
-        value = match.decode('ascii', 'ignore').strip().upper()
-        if value and value not in found:
-            found.append(value)
-    return found
+def _detect_section(data: bytes | mmap.mmap, version: str | None = None) -> str | None:
+    row = False
+    pos = data.find(_REGION_ANCHOR)
+    while pos != -1:
+        if data[max(pos - 2, 0):pos] == b'CN' or data[max(pos - 3, 0):pos] == b'PRC':
+            return _region_section(True, row, version)
+        if data[max(pos - 2, 0):pos] == b'OW':
+            row = True
+        pos = data.find(_REGION_ANCHOR, pos + 1)
+    return _region_section(False, row, version)
 
 
-def _extract_version(data: bytes) -> str | None:
-    found = _extract_unique(_VERSION_RE, data)
-    if len(found) == 1:
-        return found[0]
-    return None
+def _scan_vendor_boot(data: bytes | mmap.mmap) -> tuple[str | None, str | None, str | None]:
+    found: dict[str, set[str]] = {'version': set(), 'model': set()}
+    ends = {'version': 0, 'model': 0}
+    prc = row = False
+    for match in _VENDOR_BOOT_SCAN_RE.finditer(data):
+        kind = match.lastgroup
+        if kind == 'prc':
+            prc = True
+        elif kind == 'row':
+            row = True
+        elif match.start() >= ends[kind]:
+            ends[kind] = match.end(kind)
+            found[kind].add(bytes(data[match.start():ends[kind]]).decode('ascii', 'ignore').upper())
+        if prc and len(found['version']) > 1 and len(found['model']) > 1:
+            break
+    version = found['version'].pop() if len(found['version']) == 1 else None
+    model = found['model'].pop() if len(found['model']) == 1 else None
+    return version, model, _region_section(prc, row, version)
 
 
-def _extract_model(data: bytes) -> str | None:
-    found = _extract_unique(_MODEL_RE, data)
-    if len(found) == 1:
-        return found[0]
+def _search_props(pattern: re.Pattern[bytes], props: dict[str, str], keys: tuple[str, ...]) -> str | None:
+    for key in keys:
+        match = pattern.search(props.get(key, '').encode('ascii', 'ignore'))
+        if match:
+            return match.group().decode('ascii').upper()
     return None
 
 
+def _prop_region(props: dict[str, str]) -> str:
+    value = re.sub(r'\s+', '', props.get(_REGION_PROP_KEY, '')).upper()
+    if value in ('PRC', 'CN'):
+        return 'PRC ROM'
+    if value == 'ROW':
+        return 'ROW ROM'
+    return ''
+
+
+def _props_complete(props: dict[str, str]) -> bool:
+    return bool(
+        _prop_region(props)
+        and _search_props(_VERSION_RE, props, _VERSION_PROP_KEYS)
+        and _search_props(_MODEL_RE, props, _MODEL_PROP_KEYS + _VERSION_PROP_KEYS)
+    )
+
+
+def _inspect_vendor_boot_props(path: Path) -> tuple[str, str, str | None] | None:
+    try:
+        props = read_vendor_boot_props(path, _props_complete)
+    except Exception:
+        return None
+    if not props:
+        return None
+    build_keys = tuple(key for key in props if key.startswith('ro.') and '.build.' in key)
+    version = _search_props(_VERSION_RE, props, _VERSION_PROP_KEYS + build_keys)
+    model = _search_props(_MODEL_RE, props, _MODEL_PROP_KEYS + _VERSION_PROP_KEYS)
+    if not version or not model:
+        return None
+    section = _prop_region(props)
+    if not section:
+        tokens = '\n'.join(props[key] for key in build_keys).encode('ascii', 'ignore')
+        section = _detect_section(tokens, version)
+    return version, model, section or None
+
+
 def _load_blocked_versions(path: Path) -> dict[str, dict[str, set[str]]]:
     result: dict[str, dict[str, set[str]]] = {}
     current = ''
@@ -90,44 +217,147 @@ def _load_blocked_versions(path: Path) -> dict[str, dict[str, set[str]]]:
     return result
 
 
+def _version_key(version: str) -> tuple[str, tuple[int, ...], str] | None:
+    match = _VERSION_KEY_RE.match(version)
+    if not match:
+        return None
+    return match.group(1), tuple(int(part) for part in match.group(2).split('.')), match.group(3)
+
+
+def _has_wildcard(value: str) -> bool:
+    return any(ch in value for ch in _WILDCARD_CHARS)
+
+
+class _VersionMatcher:
+    __slots__ = ('exact', 'pattern', 'ranges')
+
+    def __init__(self, items: set[str], model: str = '') -> None:
+        self.exact: set[str] = set()
+        self.ranges: list[tuple[tuple[str, tuple[int, ...], str], tuple[str, tuple[int, ...], str]]] = []
+        globs: list[str] = []
+        for item in sorted(items):
+            if '~' in item:
+                low, high = (part.strip().strip('"').strip("'") for part in item.split('~', 1))
+                low_key = _version_key(low)
+                high_key = _version_key(high)
+                if low_key and high_key and low_key[0] == high_key[0] and low_key[2] == high_key[2]:
+                    self.ranges.append((low_key, high_key))
+                else:
+                    log('flow.block_firmware_bad_range', model=model, value=item)
+            elif _has_wildcard(item):
+                globs.append(fnmatch.translate(item))
+            else:
+                self.exact.add(item)
+        self.pattern = re.compile('|'.join(globs)) if globs else None
+
+    def matches(self, version: str) -> bool:
+        if version in self.exact:
+            return True
+        if self.pattern is not None and self.pattern.match(version):
+            return True
+        if self.ranges:
+            key = _version_key(version)
+            if key is not None:
+                for low, high in self.ranges:
+                    if key[0] == low[0] and key[2] == low[2] and low[1] <= key[1] <= high[1]:
+                        return True
+        return False
+
+
+class BlocklistIndex:
+    def __init__(self, sections: dict[str, dict[str, set[str]]]) -> None:
+        self.sections = tuple(sections)
+        self._rules: dict[tuple[str, str], _VersionMatcher] = {}
+        self._model_patterns: list[tuple[str, re.Pattern[str], _VersionMatcher]] = []
+        self._lookup: dict[tuple[str, str], tuple[_VersionMatcher, ...]] = {}
+        for section, models in sections.items():
+            for model, items in models.items():
+                matcher = _VersionMatcher(items, model)
+                if _has_wildcard(model):
+                    self._model_patterns.append((section, re.compile(fnmatch.translate(model)), matcher))
+                else:
+                    self._rules[(section, model)] = matcher
+
+    def matchers(self, section: str, model: str) -> tuple[_VersionMatcher, ...]:
+        key = (section, model)
+        found = self._lookup.get(key)
+        if found is None:
+            found = tuple(
+                [self._rules[key]] if key in self._rules else []
+            ) + tuple(
+                matcher
+                for pattern_section, pattern, matcher in self._model_patterns
+                if pattern_section == section and pattern.match(model)
+            )
+            self._lookup[key] = found
+        return found
+
+    def is_blocked(self, model: str, version: str, section_name: str = '') -> bool:
+        matchers = self.matchers(section_name, model) if section_name else ()
+        if not matchers:
+            matchers = tuple(matcher for section in self.sections for matcher in self.matchers(section, model))
+        return any(matcher.matches(version) for matcher in matchers)
+
+
+def load_blocklist_index(path: Path | None = None) -> BlocklistIndex | None:
+    path = path or BLOCK_FIRMWARE_INI
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = os.path.normcase(os.path.abspath(path))
+    cached = _blocklist_indexes.get(key)
+    if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    index = BlocklistIndex(_load_blocked_versions(path))
+    _blocklist_indexes[key] = (st.st_mtime_ns, st.st_size, index)
+    return index
+
+
 def is_firmware_version_blocked(model: str, version: str, rom_region: str, ini_path: Path | None = None) -> bool:
     model = (model or '').strip().upper()
     version = (version or '').strip().upper()
     rom_region = (rom_region or '').strip().upper()
-    path = ini_path or BLOCK_FIRMWARE_INI
-    if not model or not version or not path.is_file():
+    if not model or not version:
+        return False
+    index = load_blocklist_index(ini_path)
+    if index is None:
         return False
-    blocked = _load_blocked_versions(path)
-    candidates: set[str] = set()
     section_name = ''
     if rom_region == 'PRC':
         section_name = 'PRC ROM'
     elif rom_region == 'ROW':
         section_name = 'ROW ROM'
-    if section_name:
-        candidates |= blocked.get(section_name.upper(), {}).get(model, set())
-    if not candidates:
-        for group in blocked.values():
-            candidates |= group.get(model, set())
-    return version in candidates
+    return index.is_blocked(model, version, section_name)
 
 
-def inspect_vendor_boot_image() -> dict[str, str]:
-    image_path = IMAGE_DIR / 'vendor_boot-debug.img'
+def inspect_vendor_boot_image(image_dir: Path | None = None, fresh: dict[str, dict[str, str]] | None = None) -> dict[str, str]:
+    image_dir = image_dir or IMAGE_DIR
+    image_path = image_dir / 'vendor_boot-debug.img'
     info = {
         'model': '',
         'version': '',
         'rom_region': '',
         'rom_label': '',
     }
-    if not image_path.is_file():
+    if not get_image_index(image_dir).is_file(image_path.name):
         return info
-    data = _read_bytes(image_path)
-    if not data:
+    key = _inspection_key(image_path)
+    cached = _load_inspection_cache().get(key) if key else None
+    if cached is not None:
+        info.update(cached)
         return info
-    version = _extract_version(data) or ''
-    model = _extract_model(data) or ''
-    section = _detect_section(data, version)
+    parsed = _inspect_vendor_boot_props(image_path)
+    if parsed is not None:
+        version, model, section = parsed
+    else:
+        data = _map_file(image_path)
+        if data is None:
+            return info
+        with data:
+            version, model, section = _scan_vendor_boot(data)
+        version = version or ''
+        model = model or ''
     rom_region = ''
     rom_label = ''
     if section == 'PRC ROM':
@@ -142,12 +372,17 @@ def inspect_vendor_boot_image() -> dict[str, str]:
         'rom_region': rom_region,
         'rom_label': rom_label,
     })
+    if key:
+        if fresh is not None:
+            fresh[key] = dict(info)
+        else:
+            store_inspections({key: info})
     return info
 
 
-def inspect_flash_xml_platform() -> str | None:
-    flash_xml = FLASH_XML_DLAGENT
-    if not flash_xml.is_file():
+def inspect_flash_xml_platform(image_dir: Path | None = None) -> str | None:
+    flash_xml = image_dir / FLASH_XML_DLAGENT.parent.name / FLASH_XML_DLAGENT.name if image_dir else FLASH_XML_DLAGENT
+    if not get_image_index(flash_xml.parent).is_file(flash_xml.name):
         return None
     try:
         text = flash_xml.read_text(encoding='utf-8', errors='ignore')
@@ -174,11 +409,10 @@ def should_show_tb37x_qna_warning(*models: str) -> bool:
 
 def validate_firmware_image() -> bool:
     log('flow.firmware_version_detecting')
-    if not IMAGE_DIR.is_dir() or not (IMAGE_DIR / 'download_agent').is_dir():
+    if not image_folder_ready(IMAGE_DIR):
         log('flow.image_folder_missing')
         return False
-    image_path = IMAGE_DIR / 'vendor_boot-debug.img'
-    if not image_path.is_file():
+    if not get_image_index(IMAGE_DIR).is_file('vendor_boot-debug.img'):
         log('flow.firmware_version_file_missing')
         return False
     ini_path = BLOCK_FIRMWARE_INI
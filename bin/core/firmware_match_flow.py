@@ -0,0 +1,42 @@
+from __future__ import annotations
+from pathlib import Path
+from .firmware_catalog import FirmwareCatalog, match_connected_device, scan_firmware_library
+from .i18n import get_string
+from .utils import clear_console, log, kill_adb_server
+
+
+def _ask_library_root(saved: str) -> Path | None:
+    if saved and Path(saved).is_dir():
+        return Path(saved)
+    try:
+        raw = input(get_string('flow.catalog.root_prompt')).strip().strip('"')
+    except EOFError:
+        return None
+    if not raw:
+        return None
+    root = Path(raw)
+    if not root.is_dir():
+        log('flow.catalog.root_missing', path=raw)
+        return None
+    return root
+
+
+def run_firmware_match_flow() -> None:
+    clear_console()
+    log('app.menu.separator')
+    log('flow.catalog.start')
+    log('app.menu.separator')
+    previous = FirmwareCatalog.load()
+    root = _ask_library_root(previous.root)
+    if root is None:
+        return
+    if str(root) != previous.root:
+        previous = FirmwareCatalog()
+    log('flow.catalog.scanning', path=str(root))
+    catalog = scan_firmware_library(root, previous=previous)
+    catalog.save()
+    log('flow.catalog.scanned', count=len(catalog.entries))
+    try:
+        match_connected_device(catalog)
+    finally:
+        kill_adb_server()
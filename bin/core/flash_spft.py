@@ -2,6 +2,7 @@ import subprocess
 from pathlib import Path
 from .constants import TOOLS_DIR, SPFT_EXE, FLASH_XML_DLAGENT, FLASH_XML_ROOT, DA_AUTH_DLAGENT, DA_AUTH_ROOT
 from . import adb_utils as adb_state
+from .image_index import get_image_index
 from .utils import log, log_text, _write_log_line, capture_spft_console_output_snapshot
 
 def _resolve_spft_exe() -> Path | None:
@@ -27,7 +28,7 @@ def _resolve_spft_exe() -> Path | None:
     return None
 
 def _resolve_flash_xml() -> Path | None:
-    if FLASH_XML_DLAGENT.is_file():
+    if get_image_index(FLASH_XML_DLAGENT.parent).is_file(FLASH_XML_DLAGENT.name):
         return FLASH_XML_DLAGENT
     return None
  
@@ -37,7 +38,7 @@ def _resolve_da_auth() -> Path | None:
         DA_AUTH_DLAGENT.with_name('da.auth'),
     ]
     for path in candidates:
-        if path.is_file():
+        if get_image_index(path.parent).is_file(path.name):
             return path
     return None
 
@@ -1,8 +1,6 @@
 from __future__ import annotations
-from pathlib import Path
 import time
 import re
-from xml.etree import ElementTree as ET
 from .adb_utils import adb_reboot, kill_adb_server
 from . import adb_utils as adb_state
 from .constants import IMAGE_DIR, TOOLS_DIR, READBACK_DIR, PLATFORM_TOOLS_DIR
@@ -10,7 +8,8 @@ from .flash_spft import launch_spft_gui, run_firmware_upgrade
 from .global_flow import _ask_country_change_plan, _check_flash_xml_platform, _cleanup_after_flow, _cleanup_before_flow, _log_device_extra_info, _prepare_prc_lkdtbo_files, _country_code_feature_enabled, _normalize_rom_region, _maybe_log_tb37x_qna_warning, run_current_slot_stage, _trigger_rom_install_reboot_commands
 from .port_scan import wait_for_preloader
 from .proinfo_country import wait_and_patch_proinfo
-from .scatter import disable_lk_dtbo_partitions, prepare_platform_scatter, apply_country_plan_to_proinfo, backup_platform_scatter_to_logs, ensure_prc_platform_scatter
+from .scatter import disable_lk_dtbo_partitions, patch_userdata_keep_data, prepare_platform_scatter, apply_country_plan_to_proinfo, backup_platform_scatter_to_logs, ensure_prc_platform_scatter
+from .image_verify import verify_scatter_images
 from .firmware_guard import validate_firmware_image
 from .utils import clear_console, log, log_text, wait_for_device, adb_shell_getprop, run_adb, run_cmd, log_model_value
  
@@ -31,54 +30,6 @@ def _delete_history_ini() -> None:
         except OSError:
             pass
 
-def _iter_partitions(root: ET.Element):
-    for tag in ('partition', 'partition_index'):
-        for part in root.findall(f'.//{tag}'):
-            name_elem = part.find('partition_name')
-            if name_elem is None:
-                continue
-            name = (name_elem.text or '').strip()
-            if not name:
-                continue
-            yield (part, name)
-
-def _ensure_child_text(parent: ET.Element, tag: str, text: str) -> None:
-    elem = parent.find(tag)
-    if elem is None:
-        elem = ET.SubElement(parent, tag)
-    elem.text = text
-
-def _patch_userdata_keep_data(scatter_path: Path) -> None:
-    if not scatter_path.is_file():
-        log('scatter.userdata_not_found')
-        return
-    try:
-        tree = ET.parse(scatter_path)
-    except ET.ParseError:
-        log('scatter.userdata_not_found')
-        return
-    root = tree.getroot()
-    found_proinfo = False
-    found_userdata = False
-    for part, name in _iter_partitions(root):
-        low = name.lower()
-        if low == 'proinfo':
-            _ensure_child_text(part, 'file_name', 'proinfo')
-            _ensure_child_text(part, 'is_download', 'true')
-            _ensure_child_text(part, 'is_upgradable', 'true')
-            found_proinfo = True
-        elif low == 'userdata':
-            _ensure_child_text(part, 'is_download', 'false')
-            _ensure_child_text(part, 'is_upgradable', 'false')
-            found_userdata = True
-    if not found_proinfo:
-        log('scatter.proinfo_not_found')
-    if not found_userdata:
-        log('scatter.userdata_not_found')
-    tree.write(scatter_path, encoding='utf-8', xml_declaration=True)
-    log('scatter.userdata_patched')
-
-
 def _detect_platform_keep_data() -> str | None:
     version = (adb_shell_getprop('ro.build.version.release') or '').strip()
     adb_state.LAST_ANDROID_VERSION_RELEASE = version
@@ -133,15 +84,18 @@ def run_firmware_upgrade_keep_data_flow() -> None:
     log_text('')
     log('flow.stage3_header')
     log('flow.scatter_prepare')
-    scatter_path = prepare_platform_scatter(platform, keep_user_data=True)
-    if scatter_path is None:
+    scatter_doc = prepare_platform_scatter(platform, keep_user_data=True)
+    if scatter_doc is None:
         return
     time.sleep(3)
-    disable_lk_dtbo_partitions(platform)
-    _patch_userdata_keep_data(scatter_path)
+    disable_lk_dtbo_partitions(scatter_doc)
+    patch_userdata_keep_data(scatter_doc)
     time.sleep(3)
-    apply_country_plan_to_proinfo(platform, change_plan)
-    ensure_prc_platform_scatter(platform, preserve_userdata_false=True)
+    apply_country_plan_to_proinfo(scatter_doc, change_plan)
+    ensure_prc_platform_scatter(scatter_doc, preserve_userdata_false=True)
+    scatter_doc.save()
+    if not verify_scatter_images(scatter_doc):
+        return
     time.sleep(3)
     _delete_history_ini()
     if change_plan:
@@ -13,10 +13,12 @@ from . import downloader
 from .constants import FLASH_XML_DLAGENT, FLASH_XML_ROOT, IMAGE_DIR, READBACK_DIR, TOOLS_DIR, PLATFORM_TOOLS_DIR, LKDTBO_DIR, LKDTBO_MODEL_TO_ZIP
 from .flash_spft import launch_spft_gui, run_firmware_upgrade
 from .i18n import get_string
+from .image_index import get_image_index, invalidate_image_index
 from .port_scan import wait_for_preloader
 from .proinfo_country import wait_and_patch_proinfo
 from .firmware_guard import validate_firmware_image, detect_vendor_boot_rom_type, inspect_vendor_boot_image, should_show_tb37x_qna_warning
 from .scatter import disable_lk_dtbo_partitions, prepare_platform_scatter, apply_country_plan_to_proinfo, backup_platform_scatter_to_logs, ensure_prc_platform_scatter
+from .image_verify import verify_scatter_images
 from .utils import clear_console, log, log_text, wait_for_device, _write_log_line, run_adb, run_cmd, format_prompt_line, log_model_value, classify_model_name, log_model_support_messages, handle_unsupported_model
 
 _SETTINGS_PATH = Path(__file__).resolve().parent / 'lang' / 'settings.json'
@@ -63,7 +65,7 @@ def _preserve_current_scatter_xml() -> bool:
 
 def _cleanup_before_flow() -> None:
     if not _preserve_current_scatter_xml():
-        for path in IMAGE_DIR.glob('*_Android_scatter.xml'):
+        for path in get_image_index(IMAGE_DIR).glob('*_Android_scatter.xml'):
             try:
                 path.unlink()
             except OSError:
@@ -81,11 +83,11 @@ def _cleanup_before_flow() -> None:
         except OSError:
             pass
 
+    image_index = get_image_index(IMAGE_DIR)
     for name in ('lk.img', 'dtbo.img'):
-        p = IMAGE_DIR / name
-        if p.exists():
+        if image_index.has(name):
             try:
-                p.unlink()
+                image_index.path(name).unlink()
             except OSError:
                 pass
 
@@ -130,7 +132,7 @@ def _cleanup_after_flow(platform: str | None=None) -> None:
     else:
         pattern = '*_Android_scatter.xml'
     if not _preserve_current_scatter_xml():
-        for path in IMAGE_DIR.glob(pattern):
+        for path in get_image_index(IMAGE_DIR).glob(pattern):
             try:
                 path.unlink()
             except OSError:
@@ -205,11 +207,11 @@ def _prepare_prc_lkdtbo_files_for_model(raw_model: str) -> bool:
             model = key
             break
 
+    image_index = get_image_index(IMAGE_DIR)
     for name in ('lk_a', 'lk_b', 'dtbo_a', 'dtbo_b'):
-        p = IMAGE_DIR / name
-        if p.exists():
+        if image_index.has(name):
             try:
-                p.unlink()
+                image_index.path(name).unlink()
             except OSError:
                 pass
 
@@ -248,19 +250,10 @@ def _prepare_prc_lkdtbo_files_for_model(raw_model: str) -> bool:
     if zip_path is None or not zip_path.is_file():
         return False
     log('flow.lkdtbo_extracting')
-    ok = downloader.extract_lkdtbo_zip(zip_path, LKDTBO_DIR)
+    ok = downloader.extract_lkdtbo_zip(zip_path, LKDTBO_DIR, also_to=(IMAGE_DIR,))
+    invalidate_image_index(IMAGE_DIR)
     if not ok:
         return False
-    LKDTBO_DIR.mkdir(parents=True, exist_ok=True)
-    for name in ('lk_a', 'lk_b', 'dtbo_a', 'dtbo_b'):
-        src = LKDTBO_DIR / name
-        if not src.is_file():
-            return False
-        dst = IMAGE_DIR / name
-        try:
-            shutil.copy2(src, dst)
-        except Exception:
-            return False
     log('flow.lkdtbo_ready')
     return True
 
@@ -286,7 +279,7 @@ def _iter_flash_xml_candidates() -> list[Path]:
 
 def _find_flash_xml() -> Path | None:
     for path in _iter_flash_xml_candidates():
-        if path.is_file():
+        if get_image_index(path.parent).is_file(path.name):
             return path
     return None
 
@@ -294,7 +287,7 @@ def _check_flash_xml_platform(platform: str) -> bool:
     found_any = False
     last_mismatch: tuple[str, str] | None = None
     for flash_xml in _iter_flash_xml_candidates():
-        if not flash_xml.is_file():
+        if not get_image_index(flash_xml.parent).is_file(flash_xml.name):
             continue
         found_any = True
         try:
@@ -527,14 +520,17 @@ def run_global_firmware_upgrade_flow() -> None:
     log_text('')
     log('flow.stage3_header')
     log('flow.scatter_prepare')
-    scatter_path = prepare_platform_scatter(platform, keep_user_data=False)
-    if scatter_path is None:
+    scatter_doc = prepare_platform_scatter(platform, keep_user_data=False)
+    if scatter_doc is None:
         return
     time.sleep(3)
-    disable_lk_dtbo_partitions(platform)
+    disable_lk_dtbo_partitions(scatter_doc)
     time.sleep(3)
-    apply_country_plan_to_proinfo(platform, change_plan)
-    ensure_prc_platform_scatter(platform, preserve_userdata_false=False)
+    apply_country_plan_to_proinfo(scatter_doc, change_plan)
+    ensure_prc_platform_scatter(scatter_doc, preserve_userdata_false=False)
+    scatter_doc.save()
+    if not verify_scatter_images(scatter_doc):
+        return
     time.sleep(3)
     _delete_history_ini()
     if change_plan:
@@ -0,0 +1,600 @@
+from __future__ import annotations
+import hashlib
+import http.client
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlsplit
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+from . import download_store
+from .constants import CACHE_DIR
+from .utils import get_term_width
+
+_CHUNK_SIZE = 1024 * 64
+_RETRY_DELAYS = (1, 2, 4, 8)
+_DEFAULT_SEGMENTS = 4
+_SEGMENT_MIN_SIZE = 16 << 20
+_MIRROR_STATS_PATH = CACHE_DIR / 'mirror_stats.json'
+_MIRROR_SAMPLE_BYTES = 512 * 1024
+_MIRROR_RACE_WINDOW = 4.0
+_MIRROR_STATS_WEIGHT = 0.5
+_CONTENT_RANGE_RE = re.compile(r'^bytes\s+(\d+)-(\d+)/(\d+|\*)$', re.IGNORECASE)
+_HOST_CONCURRENCY = 2
+_host_slots: dict[str, threading.BoundedSemaphore] = {}
+_host_slots_lock = threading.Lock()
+_mirror_stats_lock = threading.Lock()
+_active_board: ProgressBoard | None = None
+
+
+class DownloadProgress:
+    def __init__(self, board: ProgressBoard | None = None) -> None:
+        self._board = board
+        self.total = 0
+        self.done = 0
+        self._base = 0
+        self._start = time.time()
+        self._last_draw = 0.0
+        self._ncols = get_term_width(108)
+        self._lock = threading.Lock()
+        if board is not None:
+            board.attach(self)
+
+    def begin(self, total: int, done: int) -> None:
+        self.total = total
+        self.done = done
+        self._base = done
+        self._start = time.time()
+
+    def advance(self, count: int) -> None:
+        with self._lock:
+            self.done += count
+            self.draw(False)
+
+    def finish(self) -> None:
+        if self.total > 0:
+            self.done = self.total
+            self.draw(True)
+
+    @staticmethod
+    def _fmt_bytes(n: int) -> str:
+        units = ['B', 'K', 'M', 'G', 'T']
+        v = float(n)
+        u = 0
+        while v >= 1024.0 and u < len(units) - 1:
+            v /= 1024.0
+            u += 1
+        if u == 0:
+            return f'{int(v)}{units[u]}'
+        if v >= 100:
+            return f'{v:.0f}{units[u]}'
+        if v >= 10:
+            return f'{v:.1f}{units[u]}'
+        return f'{v:.2f}{units[u]}'
+
+    @staticmethod
+    def _fmt_time(sec: float) -> str:
+        s = int(sec + 0.5)
+        m, s = divmod(s, 60)
+        h, m = divmod(m, 60)
+        if h > 0:
+            return f'{h:02d}:{m:02d}:{s:02d}'
+        return f'{m:02d}:{s:02d}'
+
+    def draw(self, final: bool = False) -> None:
+        if self._board is not None:
+            self._board.refresh()
+            return
+        now = time.time()
+        if (not final) and (now - self._last_draw) < 0.06:
+            return
+        self._last_draw = now
+        total = self.total
+        done = self.done
+        if total <= 0:
+            return
+        pct = min(max(done / total, 0.0), 1.0)
+        percent = int(pct * 100.0 + 0.5)
+        elapsed = now - self._start
+        rate = (done - self._base) / elapsed if elapsed > 0 else 0.0
+        remaining = (total - done) / rate if rate > 0 else 0.0
+        l_bar = f'{percent:3d}%|'
+        r_bar = f'| {self._fmt_bytes(done)}/{self._fmt_bytes(total)} [{self._fmt_time(elapsed)}<{self._fmt_time(remaining)}]'
+        bar_width = max(self._ncols - len(l_bar) - len(r_bar), 10)
+        filled = min(max(int(bar_width * pct + 0.5), 0), bar_width)
+        bar = ('█' * filled) + (' ' * (bar_width - filled))
+        line = (l_bar + bar + r_bar).ljust(self._ncols)
+        try:
+            out = sys.stdout
+            prev = getattr(out, '_lpmbox_suppress_capture', False)
+            setattr(out, '_lpmbox_suppress_capture', True)
+            try:
+                out.write('\r' + line)
+                if final:
+                    out.write('\n')
+                out.flush()
+                setattr(out, '_lpmbox_progress_open', not final)
+            finally:
+                setattr(out, '_lpmbox_suppress_capture', prev)
+        except Exception:
+            pass
+
+
+class ProgressBoard(DownloadProgress):
+    def __init__(self) -> None:
+        super().__init__()
+        self._children: list[DownloadProgress] = []
+
+    def attach(self, child: DownloadProgress) -> None:
+        with self._lock:
+            self._children.append(child)
+
+    def refresh(self, final: bool = False) -> None:
+        with self._lock:
+            self.total = sum(child.total for child in self._children)
+            self.done = sum(child.done for child in self._children)
+            self._base = sum(child._base for child in self._children)
+            DownloadProgress.draw(self, final)
+
+    def close(self) -> None:
+        if self.total > 0:
+            self.refresh(True)
+
+
+@contextmanager
+def aggregate_progress():
+    global _active_board
+    board = _active_board = ProgressBoard()
+    try:
+        yield board
+    finally:
+        _active_board = None
+        board.close()
+
+
+@contextmanager
+def _host_slot(url: str):
+    host = urlsplit(url).netloc.lower()
+    with _host_slots_lock:
+        slot = _host_slots.setdefault(host, threading.BoundedSemaphore(_HOST_CONCURRENCY))
+    with slot:
+        yield
+
+
+def _part_paths(dest: Path) -> tuple[Path, Path]:
+    return dest.with_name(dest.name + '.part'), dest.with_name(dest.name + '.part.json')
+
+
+def _load_part_meta(meta_path: Path, url: str) -> dict:
+    try:
+        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+    except Exception:
+        return {}
+    if not isinstance(meta, dict) or meta.get('url') != url:
+        return {}
+    return meta
+
+
+def _store_part_meta(meta_path: Path, meta: dict) -> None:
+    try:
+        meta_path.write_text(json.dumps(meta), encoding='utf-8')
+    except OSError:
+        pass
+
+
+def _remove_files(*paths: Path) -> None:
+    for path in paths:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def _parse_content_range(value: str | None) -> tuple[int, int] | None:
+    m = _CONTENT_RANGE_RE.match((value or '').strip())
+    if not m:
+        return None
+    total = int(m.group(3)) if m.group(3) != '*' else 0
+    return int(m.group(1)), total
+
+
+def _response_validators(resp) -> dict:
+    etag = (resp.headers.get('ETag') or '').strip()
+    last_modified = (resp.headers.get('Last-Modified') or '').strip()
+    return {
+        'etag': etag if etag and not etag.startswith('W/') else '',
+        'last_modified': last_modified,
+    }
+
+
+class _RangeIgnored(OSError):
+    pass
+
+
+def _probe_ranges(url: str, user_agent: str, timeout: float) -> tuple[str, int, dict] | None:
+    try:
+        resp = urlopen(Request(url, headers={'User-Agent': user_agent, 'Range': 'bytes=0-0'}), timeout=timeout)
+    except HTTPError as e:
+        if e.code == 416:
+            return None
+        raise
+    with resp:
+        if resp.status != 206:
+            return None
+        content_range = _parse_content_range(resp.headers.get('Content-Range'))
+        if content_range is None or content_range[0] != 0 or content_range[1] <= 0:
+            return None
+        resp.read()
+        return resp.geturl(), content_range[1], _response_validators(resp)
+
+
+def _fetch_segment(url: str, part: Path, segment: list[int], validator: str, user_agent: str, timeout: float, progress: DownloadProgress) -> None:
+    start, end, written = segment
+    if start + written > end:
+        return
+    headers = {'User-Agent': user_agent, 'Range': f'bytes={start + written}-{end}'}
+    if validator:
+        headers['If-Range'] = validator
+    with urlopen(Request(url, headers=headers), timeout=timeout) as resp:
+        content_range = _parse_content_range(resp.headers.get('Content-Range'))
+        if resp.status != 206 or content_range is None or content_range[0] != start + written:
+            raise _RangeIgnored('server ignored the segment range')
+        view = memoryview(bytearray(_CHUNK_SIZE))
+        with part.open('r+b') as f:
+            f.seek(start + written)
+            while segment[2] <= end - start:
+                n = resp.readinto(view[:min(_CHUNK_SIZE, end - start + 1 - segment[2])])
+                if not n:
+                    break
+                f.write(view[:n])
+                segment[2] += n
+                progress.advance(n)
+    if segment[2] < end - start + 1:
+        raise OSError(f'segment {start}-{end} ended after {segment[2]} bytes')
+
+
+def _fetch_segmented(url: str, part: Path, meta_path: Path, meta: dict, user_agent: str, timeout: float, progress: DownloadProgress, segments: int) -> bool:
+    probe = _probe_ranges(url, user_agent, timeout)
+    if probe is None:
+        return False
+    final_url, total, validators = probe
+    validator = validators['etag'] or validators['last_modified']
+    resumable = (
+        bool(validator)
+        and meta.get('total') == total
+        and meta.get('etag') == validators['etag']
+        and meta.get('last_modified') == validators['last_modified']
+        and isinstance(meta.get('segments'), list)
+        and part.is_file()
+        and part.stat().st_size == total
+    )
+    if resumable:
+        parts = [[int(v) for v in seg] for seg in meta['segments']]
+    else:
+        if total < _SEGMENT_MIN_SIZE:
+            return False
+        with part.open('wb') as f:
+            f.truncate(total)
+        size = -(-total // segments)
+        parts = [[start, min(start + size, total) - 1, 0] for start in range(0, total, size)]
+    meta = {'url': url, 'total': total, **validators, 'segments': parts}
+    _store_part_meta(meta_path, meta)
+    progress.begin(total, sum(seg[2] for seg in parts))
+    pending = [seg for seg in parts if seg[0] + seg[2] <= seg[1]]
+    errors: list[BaseException] = []
+    if pending:
+        with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+            futures = [pool.submit(_fetch_segment, final_url, part, seg, validator, user_agent, timeout, progress) for seg in pending]
+            for future in futures:
+                error = future.exception()
+                if error is not None:
+                    errors.append(error)
+    if any(isinstance(error, _RangeIgnored) for error in errors):
+        _remove_files(part, meta_path)
+    else:
+        _store_part_meta(meta_path, meta)
+    if errors:
+        raise errors[0]
+    return True
+
+
+def _hash_prefix(part: Path, hasher, view: memoryview) -> None:
+    with part.open('rb') as f:
+        while True:
+            n = f.readinto(view)
+            if not n:
+                break
+            hasher.update(view[:n])
+
+
+def _fetch_into_part(url: str, part: Path, meta_path: Path, user_agent: str, timeout: float, progress: DownloadProgress, segments: int = 1, head: MirrorSample | None = None) -> str | None:
+    if head is not None:
+        resp, prefix, offset, meta = head.resp, bytes(head.data), 0, {}
+    else:
+        offset = part.stat().st_size if part.is_file() else 0
+        meta = _load_part_meta(meta_path, url) if offset else {}
+        if segments > 1 and (not offset or 'segments' in meta):
+            if _fetch_segmented(url, part, meta_path, meta, user_agent, timeout, progress, segments):
+                return None
+        if 'segments' in meta:
+            _remove_files(part, meta_path)
+            offset = 0
+            meta = {}
+        validator = meta.get('etag') or meta.get('last_modified') or ''
+        headers = {'User-Agent': user_agent}
+        if offset and validator:
+            headers['Range'] = f'bytes={offset}-'
+            headers['If-Range'] = validator
+        else:
+            offset = 0
+        try:
+            resp = urlopen(Request(url, headers=headers), timeout=timeout)
+        except HTTPError as e:
+            if e.code == 416 and offset:
+                if meta.get('total') == offset:
+                    return None
+                _remove_files(part, meta_path)
+            raise
+        prefix = b''
+    with resp:
+        if offset and resp.status == 206:
+            content_range = _parse_content_range(resp.headers.get('Content-Range'))
+            if content_range is None or content_range[0] != offset:
+                _remove_files(part, meta_path)
+                raise OSError('unexpected Content-Range in resumed download')
+            total = content_range[1] or int(meta.get('total') or 0)
+            mode = 'ab'
+        else:
+            offset = 0
+            try:
+                total = int(resp.headers.get('Content-Length') or 0)
+            except Exception:
+                total = 0
+            mode = 'wb'
+        meta = {'url': url, 'total': total, **_response_validators(resp)}
+        if meta['etag'] or meta['last_modified']:
+            _store_part_meta(meta_path, meta)
+        else:
+            _remove_files(meta_path)
+        progress.begin(total, offset)
+        hasher = hashlib.sha256()
+        view = memoryview(bytearray(_CHUNK_SIZE))
+        if offset:
+            _hash_prefix(part, hasher, view)
+        with part.open(mode) as f:
+            if prefix:
+                f.write(prefix)
+                hasher.update(prefix)
+                progress.advance(len(prefix))
+            while True:
+                n = resp.readinto(view)
+                if not n:
+                    break
+                f.write(view[:n])
+                hasher.update(view[:n])
+                progress.advance(n)
+    if total and progress.done < total:
+        raise OSError(f'download ended at {progress.done} of {total} bytes')
+    return hasher.hexdigest()
+
+
+def download_file(url: str, dest: Path, user_agent: str = 'LPMBox', timeout: float = 600, retries: int = len(_RETRY_DELAYS), segments: int = _DEFAULT_SEGMENTS, sha256: str | None = None, head: MirrorSample | None = None) -> str:
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    cached = download_store.lookup(url, sha256)
+    if cached is not None:
+        if head is not None:
+            head.close()
+        download_store.link_into(cached[1], dest)
+        return cached[0]
+    part, meta_path = _part_paths(dest)
+    progress = DownloadProgress(_active_board)
+    attempt = 0
+    with _host_slot(url):
+        while True:
+            try:
+                digest = _fetch_into_part(url, part, meta_path, user_agent, timeout, progress, segments, head)
+                break
+            except HTTPError as e:
+                if e.code < 500 and e.code not in (408, 416, 429):
+                    raise
+                error: OSError = e
+            except (URLError, OSError) as e:
+                if isinstance(e, _RangeIgnored):
+                    segments = 1
+                error = e
+            except http.client.HTTPException as e:
+                error = OSError(f'{type(e).__name__}: {e}')
+            head = None
+            if attempt >= retries:
+                raise error
+            time.sleep(_RETRY_DELAYS[min(attempt, len(_RETRY_DELAYS) - 1)])
+            attempt += 1
+    _remove_files(meta_path)
+    progress.finish()
+    digest, stored = download_store.insert(part, url, sha256, digest)
+    download_store.link_into(stored, dest)
+    return digest
+
+
+def _mirror_host(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def _load_mirror_stats() -> dict[str, dict]:
+    try:
+        data = json.loads(_MIRROR_STATS_PATH.read_text(encoding='utf-8'))
+    except Exception:
+        return {}
+    return {str(k): v for k, v in data.items() if isinstance(v, dict)} if isinstance(data, dict) else {}
+
+
+def _store_mirror_stats(stats: dict[str, dict]) -> None:
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = _MIRROR_STATS_PATH.with_name(f'{_MIRROR_STATS_PATH.name}.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps(stats, indent=2), encoding='utf-8')
+        os.replace(tmp, _MIRROR_STATS_PATH)
+    except OSError:
+        pass
+
+
+def record_mirror_result(url: str, throughput: float | None, ttfb: float | None = None) -> None:
+    with _mirror_stats_lock:
+        stats = _load_mirror_stats()
+        entry = stats.setdefault(_mirror_host(url), {})
+        if throughput is None:
+            entry['failures'] = int(entry.get('failures', 0)) + 1
+        else:
+            w = _MIRROR_STATS_WEIGHT
+            old = float(entry.get('throughput') or 0.0)
+            entry['throughput'] = throughput if old <= 0 else old * (1 - w) + throughput * w
+            if ttfb is not None:
+                old_ttfb = float(entry.get('ttfb') or 0.0)
+                entry['ttfb'] = ttfb if old_ttfb <= 0 else old_ttfb * (1 - w) + ttfb * w
+            entry['failures'] = 0
+        entry['updated'] = int(time.time())
+        _store_mirror_stats(stats)
+
+
+class MirrorSample:
+    def __init__(self, url: str, resp, data: bytearray, ttfb: float, rate: float, short: bool, length: int | None):
+        self.url = url
+        self.resp = resp
+        self.data = data
+        self.ttfb = ttfb
+        self.rate = rate
+        self.short = short
+        self.length = length
+
+    def close(self) -> None:
+        try:
+            self.resp.close()
+        except (OSError, http.client.HTTPException):
+            pass
+
+
+def _sample_mirror(url: str, user_agent: str, timeout: float, stop: threading.Event) -> MirrorSample | None:
+    started = time.monotonic()
+    try:
+        resp = urlopen(Request(url, headers={'User-Agent': user_agent}), timeout=timeout)
+    except (OSError, http.client.HTTPException):
+        return None
+    try:
+        content_type = (resp.headers.get('Content-Type') or '').strip().lower()
+        if content_type and not content_type.startswith('application/'):
+            resp.close()
+            return None
+        try:
+            length = int(resp.headers.get('Content-Length') or 0) or None
+        except ValueError:
+            length = None
+        data = bytearray(resp.read(1))
+        if not data:
+            resp.close()
+            return None
+        ttfb = time.monotonic() - started
+        short = False
+        sample_start = time.monotonic()
+        deadline = started + _MIRROR_RACE_WINDOW
+        while len(data) < _MIRROR_SAMPLE_BYTES and not stop.is_set() and time.monotonic() < deadline:
+            chunk = resp.read(_CHUNK_SIZE)
+            if not chunk:
+                short = True
+                break
+            data += chunk
+        elapsed = time.monotonic() - sample_start
+    except (OSError, http.client.HTTPException):
+        resp.close()
+        return None
+    rate = len(data) / elapsed if elapsed > 0 else float(len(data))
+    return MirrorSample(url, resp, data, ttfb, rate, short, length)
+
+
+def _discard_sample(future) -> None:
+    if not future.cancelled() and future.exception() is None and future.result() is not None:
+        future.result().close()
+
+
+def _partial_mirror(dest: Path | None, urls: list[str]) -> str | None:
+    if dest is None:
+        return None
+    part, meta_path = _part_paths(dest)
+    if not part.is_file():
+        return None
+    try:
+        url = json.loads(meta_path.read_text(encoding='utf-8')).get('url')
+    except Exception:
+        return None
+    return url if url in urls else None
+
+
+def rank_mirrors(urls: list[str], user_agent: str = 'LPMBox', timeout: float = 15, dest: Path | None = None) -> tuple[list[str], MirrorSample | None]:
+    urls = list(dict.fromkeys(urls))
+    if len(urls) < 2:
+        return urls, None
+    resume = _partial_mirror(dest, urls)
+    if resume is not None:
+        return [resume] + [url for url in urls if url != resume], None
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=len(urls))
+    futures = {pool.submit(_sample_mirror, url, user_agent, timeout, stop): url for url in urls}
+    results: dict[str, MirrorSample | None] = {}
+    deadline = time.monotonic() + timeout
+    settle_at: float | None = None
+    pending = set(futures)
+    while pending:
+        limit = deadline if settle_at is None else min(deadline, settle_at)
+        remaining = limit - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                results[futures[future]] = future.result()
+            except Exception:
+                results[futures[future]] = None
+            if settle_at is None and results[futures[future]] is not None:
+                settle_at = time.monotonic() + _MIRROR_RACE_WINDOW
+    stop.set()
+    for future in pending:
+        future.add_done_callback(_discard_sample)
+    pool.shutdown(wait=False, cancel_futures=True)
+    lengths = [(url, sample.length) for url, sample in results.items() if sample is not None and sample.length]
+
+    def trusted(url: str) -> bool:
+        sample = results[url]
+        return not sample.short or any(other != url and other_length == sample.length for other, other_length in lengths)
+
+    for url, sample in results.items():
+        if sample is None:
+            record_mirror_result(url, None)
+        elif trusted(url):
+            record_mirror_result(url, sample.rate, sample.ttfb)
+    stats = _load_mirror_stats()
+    order = {url: idx for idx, url in enumerate(urls)}
+
+    def score(url: str) -> tuple[int, float, int, float, int]:
+        entry = stats.get(_mirror_host(url)) or {}
+        sample = results.get(url)
+        if sample is None:
+            rank, rate = 1, 0.0
+        elif trusted(url):
+            rank, rate = 0, sample.rate
+        else:
+            rank, rate = 2, 0.0
+        return (rank, -rate, int(entry.get('failures', 0)), -float(entry.get('throughput') or 0.0), order[url])
+
+    ordered = sorted(urls, key=score)
+    head = results.get(ordered[0])
+    if head is not None and not trusted(ordered[0]):
+        head = None
+    for sample in results.values():
+        if sample is not None and sample is not head:
+            sample.close()
+    return ordered, head
@@ -0,0 +1,133 @@
+from __future__ import annotations
+import fnmatch
+import os
+import re
+import time
+from pathlib import Path
+
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+class ImageEntry:
+    __slots__ = ('name', 'path', 'is_dir', 'is_file', 'size', 'mtime_ns')
+
+    def __init__(self, entry: os.DirEntry) -> None:
+        self.name = entry.name
+        self.path = Path(entry.path)
+        try:
+            self.is_dir = entry.is_dir()
+            self.is_file = entry.is_file()
+        except OSError:
+            self.is_dir = False
+            self.is_file = False
+        try:
+            st = entry.stat()
+            self.size = st.st_size
+            self.mtime_ns = st.st_mtime_ns
+        except OSError:
+            self.size = -1
+            self.mtime_ns = 0
+
+
+class ImageDirIndex:
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self._entries: dict[str, ImageEntry] = {}
+        self._ordered: list[ImageEntry] = []
+        self._dir_mtime_ns: int | None = None
+        self._exists = False
+        self._trusted = False
+
+    def invalidate(self) -> None:
+        self._dir_mtime_ns = None
+        self._trusted = False
+
+    def _scan(self, dir_mtime_ns: int | None) -> None:
+        entries: dict[str, ImageEntry] = {}
+        scanned_at = time.time_ns()
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    item = ImageEntry(entry)
+                    entries[os.path.normcase(item.name)] = item
+            self._exists = True
+        except OSError:
+            self._exists = False
+        self._entries = entries
+        self._ordered = sorted(entries.values(), key=lambda item: item.path)
+        self._dir_mtime_ns = dir_mtime_ns
+        # a change in the same mtime tick as the scan would go unnoticed, so recent dirs are rescanned
+        self._trusted = dir_mtime_ns is not None and scanned_at - dir_mtime_ns > _RACY_WINDOW_NS
+
+    def refresh(self) -> ImageDirIndex:
+        try:
+            dir_mtime_ns = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            dir_mtime_ns = None
+        if dir_mtime_ns is None or not self._trusted or dir_mtime_ns != self._dir_mtime_ns:
+            self._scan(dir_mtime_ns)
+        return self
+
+    @property
+    def exists(self) -> bool:
+        self.refresh()
+        return self._exists
+
+    def entries(self) -> list[ImageEntry]:
+        self.refresh()
+        return list(self._ordered)
+
+    def get(self, name: str) -> ImageEntry | None:
+        self.refresh()
+        return self._entries.get(os.path.normcase(name))
+
+    def path(self, name: str) -> Path:
+        return self.directory / name
+
+    def is_file(self, name: str) -> bool:
+        entry = self.get(name)
+        return entry is not None and entry.is_file
+
+    def is_dir(self, name: str) -> bool:
+        entry = self.get(name)
+        return entry is not None and entry.is_dir
+
+    def has(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def match(self, pattern: re.Pattern[str]) -> list[Path]:
+        return [entry.path for entry in self.entries() if entry.is_file and pattern.fullmatch(entry.name)]
+
+    def glob(self, pattern: str, files_only: bool = False) -> list[Path]:
+        return [
+            entry.path
+            for entry in self.entries()
+            if fnmatch.fnmatch(entry.name, pattern) and (entry.is_file or not files_only)
+        ]
+
+
+_INDEXES: dict[str, ImageDirIndex] = {}
+
+
+def get_image_index(directory: Path) -> ImageDirIndex:
+    key = os.path.normcase(os.path.abspath(directory))
+    index = _INDEXES.get(key)
+    if index is None:
+        index = ImageDirIndex(Path(directory))
+        _INDEXES[key] = index
+    return index
+
+
+def invalidate_image_index(directory: Path | None = None) -> None:
+    if directory is None:
+        for index in _INDEXES.values():
+            index.invalidate()
+        return
+    index = _INDEXES.get(os.path.normcase(os.path.abspath(directory)))
+    if index is not None:
+        index.invalidate()
+
+
+def image_folder_ready(image_dir: Path) -> bool:
+    index = get_image_index(image_dir)
+    return index.exists and index.is_dir('download_agent')
@@ -0,0 +1,191 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from .constants import CACHE_DIR, IMAGE_DIR
+from .image_index import get_image_index
+from .utils import log
+
+_CHECKSUM_INI_NAME = 'Checksum.ini'
+_SIDECAR_NAMES = ('SHA256SUMS', 'sha256sums.txt', 'checksums.sha256', '*.sha256')
+_SHA256_RE = re.compile(r'^[0-9a-fA-F]{64}$')
+_SUM_LINE_RE = re.compile(r'^([0-9a-fA-F]{64})\s+\*?(.+?)\s*$')
+_LOCALLY_PATCHED = frozenset({'proinfo', 'lk.img', 'dtbo.img'})
+_HASH_CHUNK_SIZE = 4 << 20
+_HASH_CACHE_PATH = CACHE_DIR / 'image_hashes.json'
+_HASH_CACHE_VERSION = 1
+_HASH_CACHE_LIMIT = 512
+_hash_cache: dict[str, str] | None = None
+
+
+def _hash_key(path: Path) -> str | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f'{os.path.normcase(os.path.abspath(path))}|{st.st_size}|{st.st_mtime_ns}'
+
+
+def _load_hash_cache() -> dict[str, str]:
+    global _hash_cache
+    if _hash_cache is None:
+        _hash_cache = {}
+        try:
+            data = json.loads(_HASH_CACHE_PATH.read_text(encoding='utf-8'))
+            if isinstance(data, dict) and data.get('version') == _HASH_CACHE_VERSION:
+                entries = data.get('entries')
+                if isinstance(entries, dict):
+                    _hash_cache = {str(k): str(v) for k, v in entries.items()}
+        except Exception:
+            pass
+    return _hash_cache
+
+
+def _store_hashes(hashes: dict[str, str]) -> None:
+    if not hashes:
+        return
+    cache = _load_hash_cache()
+    for key, digest in hashes.items():
+        cache.pop(key, None)
+        cache[key] = digest
+    while len(cache) > _HASH_CACHE_LIMIT:
+        cache.pop(next(iter(cache)))
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = _HASH_CACHE_PATH.with_name(f'{_HASH_CACHE_PATH.name}.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps({'version': _HASH_CACHE_VERSION, 'entries': cache}, indent=2), encoding='utf-8')
+        os.replace(tmp, _HASH_CACHE_PATH)
+    except OSError:
+        pass
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open('rb') as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _parse_checksum_ini(path: Path, manifest: dict[str, str]) -> int:
+    legacy = 0
+    try:
+        lines = path.read_text(encoding='utf-8', errors='ignore').splitlines()
+    except OSError:
+        return 0
+    for raw in lines:
+        line = raw.strip()
+        if not line or line.startswith((';', '#', '[')) or '=' not in line:
+            continue
+        name, value = (part.strip() for part in line.split('=', 1))
+        if name.lower() == 'version':
+            continue
+        if _SHA256_RE.match(value):
+            manifest[os.path.normcase(name)] = value.lower()
+        else:
+            legacy += 1
+    return legacy
+
+
+def _parse_sum_file(path: Path, manifest: dict[str, str]) -> None:
+    try:
+        lines = path.read_text(encoding='utf-8', errors='ignore').splitlines()
+    except OSError:
+        return
+    for raw in lines:
+        m = _SUM_LINE_RE.match(raw.strip())
+        if m:
+            name = m.group(2).replace('\\', '/').rsplit('/', 1)[-1]
+            manifest[os.path.normcase(name)] = m.group(1).lower()
+
+
+def load_checksum_manifest(image_dir: Path = IMAGE_DIR) -> tuple[dict[str, str], int]:
+    index = get_image_index(image_dir)
+    manifest: dict[str, str] = {}
+    legacy = 0
+    if index.is_file(_CHECKSUM_INI_NAME):
+        legacy = _parse_checksum_ini(index.path(_CHECKSUM_INI_NAME), manifest)
+    for pattern in _SIDECAR_NAMES:
+        for path in index.glob(pattern, files_only=True):
+            _parse_sum_file(path, manifest)
+    return manifest, legacy
+
+
+def hash_images(paths: list[Path], workers: int | None = None) -> dict[Path, str | None]:
+    cache = _load_hash_cache()
+    results: dict[Path, str | None] = {}
+    pending: list[tuple[Path, str]] = []
+    for path in paths:
+        key = _hash_key(path)
+        if key is None:
+            results[path] = None
+        elif key in cache:
+            results[path] = cache[key]
+        else:
+            pending.append((path, key))
+    if not pending:
+        return results
+    pending.sort(key=lambda item: os.path.getsize(item[0]), reverse=True)
+
+    def _work(item: tuple[Path, str]) -> tuple[Path, str, str | None]:
+        path, key = item
+        try:
+            return path, key, _sha256_file(path)
+        except OSError:
+            return path, key, None
+
+    fresh: dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=workers or min(len(pending), os.cpu_count() or 1)) as pool:
+        for path, key, digest in pool.map(_work, pending):
+            results[path] = digest
+            if digest is not None and _hash_key(path) == key:
+                fresh[key] = digest
+    _store_hashes(fresh)
+    return results
+
+
+def verify_scatter_images(doc, image_dir: Path = IMAGE_DIR) -> bool:
+    manifest, legacy = load_checksum_manifest(image_dir)
+    if not manifest:
+        if legacy:
+            log('flow.verify.legacy_only', count=legacy)
+        else:
+            log('flow.verify.no_manifest')
+        log('flow.verify.not_verified')
+        return True
+    names: list[str] = []
+    for rec in doc.partitions:
+        file_name = rec.get('file_name')
+        if rec.get('is_download').lower() != 'true' or not file_name or file_name.upper() == 'NONE':
+            continue
+        if file_name.lower() in _LOCALLY_PATCHED or file_name in names:
+            continue
+        if os.path.normcase(file_name) in manifest:
+            names.append(file_name)
+    if not names:
+        log('flow.verify.no_entries')
+        log('flow.verify.not_verified')
+        return True
+    log('flow.verify.start', count=len(names))
+    index = get_image_index(image_dir)
+    paths = {name: index.path(name) for name in names}
+    missing = [name for name in names if not index.is_file(name)]
+    digests = hash_images([paths[name] for name in names if name not in missing])
+    ok = True
+    for name in missing:
+        log('flow.verify.missing', name=name)
+        ok = False
+    for name in names:
+        if name in missing:
+            continue
+        if digests.get(paths[name]) != manifest[os.path.normcase(name)]:
+            log('flow.verify.mismatch', name=name)
+            ok = False
+    if ok:
+        log('flow.verify.ok', count=len(names))
+    else:
+        log('flow.verify.failed')
+    return ok
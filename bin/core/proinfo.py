@@ -0,0 +1,156 @@
+from __future__ import annotations
+import argparse
+import fnmatch
+import os
+import sys
+from pathlib import Path
+
+COUNTRIES: list[tuple[str, str]] = [('Argentina', 'AR'), ('Armenia', 'AM'), ('Australia', 'AU'), ('Austria', 'AT'), ('Azerbaijan', 'AZ'), ('Bahrain', 'BH'), ('Belgium', 'BE'), ('Brazil', 'BR'), ('Bulgaria', 'BG'), ('Canada', 'CA'), ('Chile', 'CL'), ('China', 'CN'), ('Colombia', 'CO'), ('Costa Rica', 'CR'), ('Croatia', 'HR'), ('Cyprus', 'CY'), ('Czech Republic', 'CZ'), ('Denmark', 'DK'), ('Ecuador', 'EC'), ('Egypt', 'EG'), ('El Salvador', 'SV'), ('Estonia', 'EE'), ('Finland', 'FI'), ('France', 'FR'), ('Georgia', 'GE'), ('Germany', 'DE'), ('Ghana', 'GH'), ('Greece', 'GR'), ('Guatemala', 'GT'), ('Hong Kong', 'HK'), ('Hungary', 'HU'), ('Iceland', 'IS'), ('India', 'IN'), ('Indonesia', 'ID'), ('Israel', 'IL'), ('Italy', 'IT'), ('Japan', 'JP'), ('Jordan', 'JO'), ('Kazakhstan', 'KZ'), ('Kenya', 'KE'), ('Korea', 'KR'), ('Kuwait', 'KW'), ('Kyrgyzstan', 'KG'), ('Latvia', 'LV'), ('Lebanon', 'LB'), ('Lithuania', 'LT'), ('Malaysia', 'MY'), ('Mexico', 'MX'), ('Moldova', 'MD'), ('Morocco', 'MA'), ('Mozambique', 'MZ'), ('Netherlands', 'NL'), ('New Zealand', 'NZ'), ('Nigeria', 'NG'), ('Norway', 'NO'), ('Oman', 'OM'), ('Pakistan', 'PK'), ('Panama', 'PA'), ('Peru', 'PE'), ('Philippines', 'PH'), ('Poland', 'PL'), ('Portugal', 'PT'), ('Qatar', 'QA'), ('Romania', 'RO'), ('Russia', 'RU'), ('Saudi Arabia', 'SA'), ('Serbia', 'RS'), ('Singapore', 'SG'), ('Slovakia', 'SK'), ('Slovenia', 'SI'), ('South Africa', 'ZA'), ('Spain', 'ES'), ('Sweden', 'SE'), ('Switzerland', 'CH'), ('Taiwan', 'TW'), ('Tajikistan', 'TJ'), ('Tanzania', 'TZ'), ('Thailand', 'TH'), ('Tunisia', 'TN'), ('Turkey', 'TR'), ('Uganda', 'UG'), ('Ukraine', 'UA'), ('United Arab Emirates', 'AE'), ('United Kingdom', 'GB'), ('United States of America', 'US'), ('Uruguay', 'UY'), ('Uzbekistan', 'UZ'), ('Venezuela', 'VE'), ('Vietnam', 'VN')]
+_COUNTRY_TOKEN_SIZE = 4
+_COUNTRY_ORDER = {code: idx for idx, (_, code) in enumerate(COUNTRIES)}
+_COUNTRY_PREFIXES = {code.encode('ascii'): code for code in _COUNTRY_ORDER}
+_COUNTRY_SUFFIX = b'XX'
+
+
+def scan_country_tokens(data: bytes | bytearray) -> list[tuple[int, str]]:
+    hits: list[tuple[int, str]] = []
+    pos = data.find(_COUNTRY_SUFFIX, 2)
+    while pos != -1:
+        code = _COUNTRY_PREFIXES.get(bytes(data[pos - 2:pos]))
+        if code is not None:
+            hits.append((pos - 2, code))
+        pos = data.find(_COUNTRY_SUFFIX, pos + 1)
+    return hits
+
+
+def _country_at(data: bytes | bytearray, offset: int) -> str | None:
+    token = bytes(data[offset:offset + _COUNTRY_TOKEN_SIZE])
+    if token[2:] != _COUNTRY_SUFFIX:
+        return None
+    return _COUNTRY_PREFIXES.get(token[:2])
+
+
+def read_proinfo_buffer(path: Path) -> bytearray:
+    with path.open('rb') as fh:
+        data = bytearray(os.fstat(fh.fileno()).st_size)
+        size = fh.readinto(data)
+    del data[size:]
+    return data
+
+
+class ProinfoRecord:
+    __slots__ = ('buffer', 'path', 'country_offset', 'country_hits')
+
+    def __init__(self, buffer: bytes | bytearray, path: Path | None = None) -> None:
+        self.buffer = buffer
+        self.path = path
+        self.country_hits = scan_country_tokens(buffer)
+        best = min(self.country_hits, key=lambda hit: (_COUNTRY_ORDER[hit[1]], hit[0]), default=None)
+        self.country_offset: int | None = best[0] if best is not None else None
+
+    @classmethod
+    def load(cls, path: Path) -> ProinfoRecord:
+        return cls(read_proinfo_buffer(path), path)
+
+    def view(self, offset: int, size: int) -> memoryview:
+        return memoryview(self.buffer)[offset:offset + size]
+
+    @property
+    def country(self) -> str:
+        if self.country_offset is None:
+            return ''
+        return _country_at(self.buffer, self.country_offset) or ''
+
+    @property
+    def country_token(self) -> str:
+        code = self.country
+        return code + 'XX' if code else ''
+
+    @property
+    def ambiguous(self) -> bool:
+        return len(self.country_hits) > 1
+
+    def fields(self) -> dict[str, str]:
+        offset = '' if self.country_offset is None else f'0x{self.country_offset:X}'
+        return {'country': self.country, 'country_offset': offset, 'size': str(len(self.buffer))}
+
+    def validate(self) -> list[str]:
+        problems: list[str] = []
+        if self.country_offset is None:
+            problems.append('country')
+        if self.ambiguous:
+            problems.append('ambiguous')
+        return problems
+
+    def diff(self, other: ProinfoRecord) -> list[tuple[str, str, str]]:
+        mine = self.fields()
+        theirs = other.fields()
+        return [(name, mine[name], theirs[name]) for name in mine if mine[name] != theirs[name]]
+
+    def set_country(self, code: str) -> bool:
+        token = (code.upper() + 'XX').encode('ascii')
+        if self.country_offset is None or len(token) != _COUNTRY_TOKEN_SIZE:
+            return False
+        self.view(self.country_offset, _COUNTRY_TOKEN_SIZE)[:] = token
+        return True
+
+
+def _iter_dump_paths(targets: list[str], pattern: str) -> list[Path]:
+    paths: list[Path] = []
+    for target in targets:
+        path = Path(target)
+        if path.is_dir():
+            for root, _dirs, files in os.walk(path):
+                paths.extend(Path(root) / name for name in files if fnmatch.fnmatch(name.lower(), pattern.lower()))
+        elif path.is_file():
+            paths.append(path)
+    return sorted(paths)
+
+
+def audit_proinfo_dumps(paths: list[Path]) -> list[tuple[Path, ProinfoRecord | None, list[str]]]:
+    results: list[tuple[Path, ProinfoRecord | None, list[str]]] = []
+    for path in paths:
+        try:
+            record = ProinfoRecord.load(path)
+        except OSError:
+            results.append((path, None, ['unreadable']))
+            continue
+        results.append((path, record, record.validate()))
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m core.proinfo')
+    sub = parser.add_subparsers(dest='command', required=True)
+    audit = sub.add_parser('audit', help='decode and validate every proinfo dump under the given paths')
+    audit.add_argument('paths', nargs='+')
+    audit.add_argument('--pattern', default='proinfo*')
+    show = sub.add_parser('show', help='print the decoded fields of one dump')
+    show.add_argument('path')
+    diff = sub.add_parser('diff', help='compare the decoded fields of two dumps')
+    diff.add_argument('old')
+    diff.add_argument('new')
+    args = parser.parse_args(argv)
+    if args.command == 'show':
+        record = ProinfoRecord.load(Path(args.path))
+        for name, value in record.fields().items():
+            print(f'{name}: {value}')
+        for problem in record.validate():
+            print(f'problem: {problem}')
+        return 0
+    if args.command == 'diff':
+        changes = ProinfoRecord.load(Path(args.old)).diff(ProinfoRecord.load(Path(args.new)))
+        for name, old, new in changes:
+            print(f'{name}: {old} -> {new}')
+        return 1 if changes else 0
+    failed = 0
+    for path, record, problems in audit_proinfo_dumps(_iter_dump_paths(args.paths, args.pattern)):
+        if problems:
+            failed += 1
+        country = (record.country if record is not None else '') or '?'
+        print(f'{"FAIL" if problems else "OK":<4} {country:<2} {",".join(problems) or "-":<24} {path}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,32 +4,14 @@ from pathlib import Path
 from .constants import READBACK_DIR, IMAGE_DIR, SPFT_EXE
 from .utils import log, log_text
 from .i18n import get_string
-COUNTRIES: list[tuple[str, str]] = [('Argentina', 'AR'), ('Armenia', 'AM'), ('Australia', 'AU'), ('Austria', 'AT'), ('Azerbaijan', 'AZ'), ('Bahrain', 'BH'), ('Belgium', 'BE'), ('Brazil', 'BR'), ('Bulgaria', 'BG'), ('Canada', 'CA'), ('Chile', 'CL'), ('China', 'CN'), ('Colombia', 'CO'), ('Costa Rica', 'CR'), ('Croatia', 'HR'), ('Cyprus', 'CY'), ('Czech Republic', 'CZ'), ('Denmark', 'DK'), ('Ecuador', 'EC'), ('Egypt', 'EG'), ('El Salvador', 'SV'), ('Estonia', 'EE'), ('Finland', 'FI'), ('France', 'FR'), ('Georgia', 'GE'), ('Germany', 'DE'), ('Ghana', 'GH'), ('Greece', 'GR'), ('Guatemala', 'GT'), ('Hong Kong', 'HK'), ('Hungary', 'HU'), ('Iceland', 'IS'), ('India', 'IN'), ('Indonesia', 'ID'), ('Israel', 'IL'), ('Italy', 'IT'), ('Japan', 'JP'), ('Jordan', 'JO'), ('Kazakhstan', 'KZ'), ('Kenya', 'KE'), ('Korea', 'KR'), ('Kuwait', 'KW'), ('Kyrgyzstan', 'KG'), ('Latvia', 'LV'), ('Lebanon', 'LB'), ('Lithuania', 'LT'), ('Malaysia', 'MY'), ('Mexico', 'MX'), ('Moldova', 'MD'), ('Morocco', 'MA'), ('Mozambique', 'MZ'), ('Netherlands', 'NL'), ('New Zealand', 'NZ'), ('Nigeria', 'NG'), ('Norway', 'NO'), ('Oman', 'OM'), ('Pakistan', 'PK'), ('Panama', 'PA'), ('Peru', 'PE'), ('Philippines', 'PH'), ('Poland', 'PL'), ('Portugal', 'PT'), ('Qatar', 'QA'), ('Romania', 'RO'), ('Russia', 'RU'), ('Saudi Arabia', 'SA'), ('Serbia', 'RS'), ('Singapore', 'SG'), ('Slovakia', 'SK'), ('Slovenia', 'SI'), ('South Africa', 'ZA'), ('Spain', 'ES'), ('Sweden', 'SE'), ('Switzerland', 'CH'), ('Taiwan', 'TW'), ('Tajikistan', 'TJ'), ('Tanzania', 'TZ'), ('Thailand', 'TH'), ('Tunisia', 'TN'), ('Turkey', 'TR'), ('Uganda', 'UG'), ('Ukraine', 'UA'), ('United Arab Emirates', 'AE'), ('United Kingdom', 'GB'), ('United States of America', 'US'), ('Uruguay', 'UY'), ('Uzbekistan', 'UZ'), ('Venezuela', 'VE'), ('Vietnam', 'VN')]
+from .image_index import invalidate_image_index
+from .readback_watch import ReadbackWatcher
+from .proinfo import COUNTRIES, ProinfoRecord
 
-def _detect_current_code(data: bytes) -> str:
-    for _, code in COUNTRIES:
-        token = (code + 'XX').encode('ascii')
-        idx = data.find(token)
-        if idx != -1:
-            return code + 'XX'
-    idx = data.find(b'CNXX')
-    if idx != -1:
-        return 'CNXX'
-    return ''
-
-def _patch_country(data: bytes, new_code: str) -> bytes:
-    token_new = (new_code + 'XX').encode('ascii')
-    for _, code in COUNTRIES:
-        token_old = (code + 'XX').encode('ascii')
-        idx = data.find(token_old)
-        if idx != -1:
-            if len(token_old) != len(token_new):
-                return data
-            return data[:idx] + token_new + data[idx + len(token_old):]
-    idx = data.find(b'CNXX')
-    if idx != -1 and len(token_new) == 4:
-        return data[:idx] + token_new + data[idx + 4:]
-    return data
+def _detect_current_code(record: ProinfoRecord) -> str:
+    if record.ambiguous:
+        log('country.ambiguous', hits=', '.join(f'{code}XX@0x{offset:X}' for offset, code in record.country_hits))
+    return record.country_token
 
 def _print_country_menu() -> None:
     log_text(get_string('app.menu.separator'))
@@ -73,23 +55,19 @@ def _select_country() -> str:
 def wait_and_patch_proinfo(platform: str) -> None:
     READBACK_DIR.mkdir(parents=True, exist_ok=True)
     log('flow.wait_proinfo')
-    data: bytes | None = None
-    while True:
-        files = list(READBACK_DIR.glob('proinfo*'))
-        if not files:
-            time.sleep(3)
-            continue
-        proinfo_path = max(files, key=lambda p: p.stat().st_mtime)
-        try:
-            data = proinfo_path.read_bytes()
-            break
-        except PermissionError:
-            time.sleep(3)
-            continue
-        except Exception:
-            time.sleep(3)
-            continue
-    if data is None:
+    record: ProinfoRecord | None = None
+    with ReadbackWatcher(READBACK_DIR, 'proinfo*') as watcher:
+        while True:
+            proinfo_path = watcher.wait()
+            if proinfo_path is None:
+                continue
+            try:
+                record = ProinfoRecord.load(proinfo_path)
+                break
+            except Exception:
+                time.sleep(1)
+                continue
+    if record is None:
         log('country.no_file')
         return
     try:
@@ -100,7 +78,7 @@ def wait_and_patch_proinfo(platform: str) -> None:
         subprocess.run(['taskkill', '/f', '/im', exe_name], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
     except Exception:
         pass
-    current = _detect_current_code(data)
+    current = _detect_current_code(record)
     if not current:
         log('country.not_detected')
         log('cable.check_1')
@@ -108,10 +86,10 @@ def wait_and_patch_proinfo(platform: str) -> None:
     new_code = _select_country()
     if not new_code:
         log('country.no_change')
-        patched = data
     else:
         log('country.patching', code=new_code)
-        patched = _patch_country(data, new_code)
+        record.set_country(new_code)
     dst = IMAGE_DIR / 'proinfo'
-    dst.write_bytes(patched)
+    dst.write_bytes(record.buffer)
+    invalidate_image_index(IMAGE_DIR)
     log('flow.proinfo_copied')
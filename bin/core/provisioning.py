@@ -0,0 +1,28 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from .http_download import aggregate_progress
+from .utils import log
+
+
+def run_provisioning(steps: list[tuple[str, Callable[[], bool]]]) -> dict[str, bool]:
+    results: dict[str, bool] = {}
+    failures: list[tuple[str, str]] = []
+    with aggregate_progress(), ThreadPoolExecutor(max_workers=max(len(steps), 1)) as pool:
+        futures = [(name, pool.submit(step)) for name, step in steps]
+        for name, future in futures:
+            try:
+                ok = future.result() is True
+                error = ''
+            except Exception as e:
+                ok = False
+                error = str(e) or type(e).__name__
+            results[name] = ok
+            if not ok:
+                failures.append((name, error))
+    for name, error in failures:
+        if error:
+            log('bootstrap.step_error', step=name, error=error)
+        else:
+            log('bootstrap.step_failed', step=name)
+    return results
@@ -0,0 +1,143 @@
+from __future__ import annotations
+import fnmatch
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+_SETTLE_SECONDS = 0.5
+_POLL_INTERVAL = 0.2
+
+
+class _Inotify:
+    def __init__(self, directory: Path) -> None:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        mask = _IN_CLOSE_WRITE | _IN_CREATE | _IN_MODIFY | _IN_MOVED_TO
+        if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(err, 'inotify_add_watch failed')
+        self.fd = fd
+
+    def read(self, timeout: float) -> list[tuple[str, int]]:
+        ready, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+        if not ready:
+            return []
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events: list[tuple[str, int]] = []
+        pos = 0
+        while pos + _EVENT_HEADER.size <= len(buf):
+            _wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, pos)
+            pos += _EVENT_HEADER.size
+            name = buf[pos:pos + length].split(b'\0', 1)[0]
+            pos += length
+            if name:
+                events.append((os.fsdecode(name), mask))
+        return events
+
+    def close(self) -> None:
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class ReadbackWatcher:
+    def __init__(self, directory: Path, pattern: str = 'proinfo*', settle: float = _SETTLE_SECONDS, poll_interval: float = _POLL_INTERVAL) -> None:
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self._seen: dict[str, tuple[int, int, float]] = {}
+        self._closed: set[str] = set()
+        self._inotify: _Inotify | None = None
+        if sys.platform.startswith('linux'):
+            try:
+                self._inotify = _Inotify(self.directory)
+            except Exception:
+                self._inotify = None
+
+    def __enter__(self) -> ReadbackWatcher:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _matches(self, name: str) -> bool:
+        return fnmatch.fnmatch(os.path.normcase(name), os.path.normcase(self.pattern))
+
+    def _scan(self) -> None:
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if self._matches(entry.name) and entry.name not in self._seen:
+                        self._seen[entry.name] = (-1, 0, 0.0)
+        except OSError:
+            pass
+
+    def _settled(self, now: float) -> Path | None:
+        best: tuple[int, Path] | None = None
+        for name, (size, mtime_ns, since) in list(self._seen.items()):
+            path = self.directory / name
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._seen.pop(name, None)
+                self._closed.discard(name)
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                self._seen[name] = (st.st_size, st.st_mtime_ns, now)
+                if name not in self._closed:
+                    continue
+            elif name not in self._closed and now - since < self.settle:
+                continue
+            if st.st_size > 0 and (best is None or st.st_mtime_ns > best[0]):
+                best = (st.st_mtime_ns, path)
+        return best[1] if best is not None else None
+
+    def wait(self, timeout: float | None = None) -> Path | None:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._scan()
+        while True:
+            now = time.monotonic()
+            ready = self._settled(now)
+            if ready is not None:
+                self._seen.pop(ready.name, None)
+                self._closed.discard(ready.name)
+                return ready
+            if deadline is not None and now >= deadline:
+                return None
+            wait_time = self.poll_interval if deadline is None else min(self.poll_interval, deadline - now)
+            if self._inotify is None:
+                time.sleep(wait_time)
+                self._scan()
+                continue
+            for name, mask in self._inotify.read(wait_time):
+                if not self._matches(name):
+                    continue
+                self._seen.setdefault(name, (-1, 0, 0.0))
+                if mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                    self._closed.add(name)
+                else:
+                    self._closed.discard(name)
@@ -5,10 +5,12 @@ from pathlib import Path
 from . import adb_utils as adb_state
 from .flash_spft import launch_spft_gui, run_firmware_upgrade
 from .firmware_guard import inspect_vendor_boot_image, inspect_flash_xml_platform, should_show_tb37x_qna_warning, is_firmware_version_blocked
+from .image_index import image_folder_ready
 from .global_flow import _cleanup_after_flow, _cleanup_before_flow, _country_code_feature_enabled, _delete_history_ini, _prepare_prc_lkdtbo_files_for_model
 from .port_scan import wait_for_preloader
 from .proinfo_country import wait_and_patch_proinfo
 from .scatter import disable_lk_dtbo_partitions, prepare_platform_scatter, apply_country_plan_to_proinfo, backup_platform_scatter_to_logs, ensure_prc_platform_scatter
+from .image_verify import verify_scatter_images
 from .utils import clear_console, log, log_text, log_model_value, classify_model_name, log_model_support_messages
 from .i18n import get_string
 from .constants import IMAGE_DIR, PLATFORM_TOOLS_DIR
@@ -87,7 +89,7 @@ def _ask_country_change_plan_reinstall() -> bool:
 
 def _inspect_image_folder() -> tuple[str, str, str] | None:
     log('flow.firmware_version_detecting')
-    if not IMAGE_DIR.is_dir() or not (IMAGE_DIR / 'download_agent').is_dir():
+    if not image_folder_ready(IMAGE_DIR):
         log('flow.image_folder_missing')
         return None
     info = inspect_vendor_boot_image()
@@ -148,14 +150,17 @@ def run_firmware_reinstall_flow() -> None:
     log_text('')
     log('flow.reinstall.stage2_header')
     log('flow.scatter_prepare')
-    scatter_path = prepare_platform_scatter(platform, keep_user_data=False)
-    if scatter_path is None:
+    scatter_doc = prepare_platform_scatter(platform, keep_user_data=False)
+    if scatter_doc is None:
         return
     time.sleep(1)
-    disable_lk_dtbo_partitions(platform)
+    disable_lk_dtbo_partitions(scatter_doc)
     time.sleep(1)
-    apply_country_plan_to_proinfo(platform, change_plan)
-    ensure_prc_platform_scatter(platform, preserve_userdata_false=False)
+    apply_country_plan_to_proinfo(scatter_doc, change_plan)
+    ensure_prc_platform_scatter(scatter_doc, preserve_userdata_false=False)
+    scatter_doc.save()
+    if not verify_scatter_images(scatter_doc):
+        return
     time.sleep(1)
     _delete_history_ini()
     if change_plan:
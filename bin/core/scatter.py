@@ -7,12 +7,19 @@ from datetime import datetime
 from .constants import IMAGE_DIR, LOGS_DIR, LKDTBO_MODEL_TO_ZIP
 from .adb_utils import adb_shell_getprop
 from . import adb_utils as adb_state
-from .utils import log
+from .utils import log, normalize_model_name
 from .xml_crypto import decrypt_scatter_x
 from .firmware_guard import inspect_vendor_boot_image
+from .image_index import get_image_index, invalidate_image_index
 
 _SCATTER_XML_RE = re.compile(r'^.+_Android_scatter\.xml$', re.IGNORECASE)
 _SCATTER_X_RE = re.compile(r'^.+_Android_scatter\.x$', re.IGNORECASE)
+_SCATTER_TXT_RE = re.compile(r'^.+_Android_scatter\.txt$', re.IGNORECASE)
+_XML_TEXT_ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+_XML_ATTR_ESCAPES = str.maketrans({
+    '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;',
+    '\r': '&#13;', '\n': '&#10;', '\t': '&#09;',
+})
 
 PRC_TRUE_PARTITIONS = {
     'preloader_a', 'preloader_b', 'vbmeta_a', 'vbmeta_system_a', 'vbmeta_vendor_a',
@@ -22,28 +29,75 @@ PRC_TRUE_PARTITIONS = {
     'connsys_gnss_a', 'logo_a', 'lenovocust', 'lenovoraw', 'super', 'userdata',
 }
 
-def _is_prc_partition_enabled(lower_name: str) -> bool:
-    if lower_name in PRC_TRUE_PARTITIONS:
-        return True
-    if lower_name.endswith('_a') or lower_name.endswith('_b'):
-        bases = {
-            name[:-2] if name.endswith('_a') or name.endswith('_b') else name
-            for name in PRC_TRUE_PARTITIONS
+DOWNLOAD_PROFILE_RULES: dict[str, dict] = {
+    'PRC': {
+        'enable': PRC_TRUE_PARTITIONS,
+        'match_slots': True,
+        'keep_source_flags': False,
+        'disable_none_file': True,
+    },
+    'ROW': {
+        'enable': (),
+        'match_slots': False,
+        'keep_source_flags': True,
+        'disable_none_file': True,
+    },
+}
+
+MODEL_DOWNLOAD_PROFILE_RULES: dict[tuple[str, str], dict] = {}
+
+
+class DownloadProfile:
+    __slots__ = ('exact', 'slot_bases', 'keep_source_flags', 'disable_none_file')
+
+    def __init__(self, rules: dict) -> None:
+        names = frozenset(name.lower() for name in rules.get('enable', ()))
+        self.exact = names
+        if rules.get('match_slots'):
+            self.slot_bases = frozenset(
+                name[:-2] if name.endswith('_a') or name.endswith('_b') else name
+                for name in names
+            )
+        else:
+            self.slot_bases = frozenset()
+        self.keep_source_flags = bool(rules.get('keep_source_flags'))
+        self.disable_none_file = bool(rules.get('disable_none_file', True))
+
+    def enables(self, lower_name: str) -> bool:
+        if lower_name in self.exact:
+            return True
+        if lower_name.endswith('_a') or lower_name.endswith('_b'):
+            return lower_name[:-2] in self.slot_bases
+        return False
+
+    def enabled_set(self, index: PartitionIndex) -> set[PartitionRecord]:
+        exact = self.exact
+        slot_bases = self.slot_bases
+        keep_source = self.keep_source_flags
+        disable_none = self.disable_none_file
+        return {
+            rec for rec in index
+            if (keep_source or rec.lower in exact or (rec.slot and rec.base in slot_bases))
+            and not (disable_none and rec.get('file_name').upper() == 'NONE')
         }
-        return lower_name[:-2] in bases
-    return False
 
 
+_DOWNLOAD_PROFILES = {region: DownloadProfile(rules) for region, rules in DOWNLOAD_PROFILE_RULES.items()}
+_MODEL_DOWNLOAD_PROFILES = {key: DownloadProfile(rules) for key, rules in MODEL_DOWNLOAD_PROFILE_RULES.items()}
+
+
+def _download_profile(region: str, raw_model: str = '') -> DownloadProfile:
+    region = (region or '').strip().upper()
+    if raw_model and _MODEL_DOWNLOAD_PROFILES:
+        profile = _MODEL_DOWNLOAD_PROFILES.get((region, normalize_model_name(raw_model)))
+        if profile is not None:
+            return profile
+    return _DOWNLOAD_PROFILES.get(region) or _DOWNLOAD_PROFILES['ROW']
+
+
+def _is_prc_partition_enabled(lower_name: str) -> bool:
+    return _DOWNLOAD_PROFILES['PRC'].enables(lower_name)
 
-def _iter_scatter_named_files(pattern: re.Pattern[str], base_dir: Path | None = None) -> list[Path]:
-    directory = base_dir or IMAGE_DIR
-    if not directory.is_dir():
-        return []
-    return [
-        path
-        for path in sorted(directory.iterdir())
-        if path.is_file() and pattern.fullmatch(path.name)
-    ]
 
 
 def _current_image_rom_region() -> str:
@@ -71,95 +125,223 @@ def _is_prc_context_any() -> bool:
 
 
 def _find_scatter_source(platform: str) -> Path:
-    if not IMAGE_DIR.is_dir():
+    image_index = get_image_index(IMAGE_DIR)
+    if not image_index.exists:
         raise FileNotFoundError('image directory not found')
-    expected_xml = IMAGE_DIR / f'{platform}_Android_scatter.xml'
-    if expected_xml.is_file():
-        return expected_xml
-    expected_x = IMAGE_DIR / f'{platform}_Android_scatter.x'
-    if expected_x.is_file():
-        return expected_x
-    xml_candidates = _iter_scatter_named_files(_SCATTER_XML_RE, IMAGE_DIR)
+    for name in (f'{platform}_Android_scatter.xml', f'{platform}_Android_scatter.x'):
+        if image_index.is_file(name):
+            return image_index.path(name)
+    xml_candidates = image_index.match(_SCATTER_XML_RE)
     if xml_candidates:
         return xml_candidates[0]
-    x_candidates = _iter_scatter_named_files(_SCATTER_X_RE, IMAGE_DIR)
+    x_candidates = image_index.match(_SCATTER_X_RE)
     if x_candidates:
         return x_candidates[0]
-    glob_xml = sorted(path for path in IMAGE_DIR.glob('*Android_scatter*.xml') if path.is_file())
+    glob_xml = image_index.glob('*Android_scatter*.xml', files_only=True)
     if glob_xml:
         return glob_xml[0]
-    glob_x = sorted(path for path in IMAGE_DIR.glob('*Android_scatter*.x') if path.is_file())
+    glob_x = image_index.glob('*Android_scatter*.x', files_only=True)
     if glob_x:
         return glob_x[0]
+    expected_txt = f'{platform}_Android_scatter.txt'
+    if image_index.is_file(expected_txt):
+        return image_index.path(expected_txt)
+    txt_candidates = image_index.match(_SCATTER_TXT_RE)
+    if txt_candidates:
+        return txt_candidates[0]
     raise FileNotFoundError('no scatter source file')
 
 
-def _scatter_text_to_xml(text: str) -> str:
+def _load_text_scatter(scatter_source: Path) -> tuple[ET.Element, list[tuple[ET.Element, str]]]:
     root = ET.Element('scatter')
+    entries: list[tuple[ET.Element, str]] = []
     current: ET.Element | None = None
-    for raw_line in text.splitlines():
-        line = raw_line.replace('\ufeff', '').strip()
-        if not line or line.startswith('#'):
-            continue
-        if line.endswith(':'):
-            probe = line[:-1].strip()
-            if probe in {'info', 'config', 'layout_check'}:
+    in_partition = False
+    named = False
+    with scatter_source.open('r', encoding='utf-8', errors='ignore') as fh:
+        for raw_line in fh:
+            line = raw_line.replace('\ufeff', '').strip()
+            if not line or line.startswith('#'):
                 continue
-        stripped = line
-        is_dash = stripped.startswith('- ')
-        if is_dash:
-            stripped = stripped[2:].strip()
-        if ':' not in stripped:
-            continue
-        key, value = stripped.split(':', 1)
-        key = key.strip()
-        value = value.strip()
-        if key == 'general':
-            current = ET.SubElement(root, 'general')
-            if value:
-                ET.SubElement(current, 'section_name').text = value
-            continue
-        if key in {'partition_index', 'partition'} and is_dash:
-            current = ET.SubElement(root, 'partition')
-            ET.SubElement(current, 'partition_index').text = value
-            continue
-        if current is None:
-            current = ET.SubElement(root, 'general')
-        ET.SubElement(current, key).text = value
-    return ET.tostring(root, encoding='unicode')
+            if line.endswith(':'):
+                probe = line[:-1].strip()
+                if probe in {'info', 'config', 'layout_check'}:
+                    continue
+            stripped = line
+            is_dash = stripped.startswith('- ')
+            if is_dash:
+                stripped = stripped[2:].strip()
+            if ':' not in stripped:
+                continue
+            key, value = stripped.split(':', 1)
+            key = key.strip()
+            value = value.strip()
+            if key == 'general':
+                current = ET.SubElement(root, 'general')
+                in_partition = False
+                if value:
+                    ET.SubElement(current, 'section_name').text = value
+                continue
+            if key in {'partition_index', 'partition'} and is_dash:
+                current = ET.SubElement(root, 'partition')
+                in_partition = True
+                named = False
+                ET.SubElement(current, 'partition_index').text = value
+                continue
+            if current is None:
+                current = ET.SubElement(root, 'general')
+            ET.SubElement(current, key).text = value
+            if in_partition and not named and key == 'partition_name':
+                named = True
+                if value:
+                    entries.append((current, value))
+    return root, entries
+
+
+def _write_xml_element(write, elem: ET.Element) -> None:
+    tag = elem.tag
+    write('<' + tag)
+    for key, value in elem.items():
+        write(f' {key}="{value.translate(_XML_ATTR_ESCAPES)}"')
+    text = elem.text
+    if text or len(elem):
+        write('>')
+        if text:
+            write(text.translate(_XML_TEXT_ESCAPES))
+        for child in elem:
+            _write_xml_element(write, child)
+        write('</' + tag + '>')
+    else:
+        write(' />')
+    if elem.tail:
+        write(elem.tail.translate(_XML_TEXT_ESCAPES))
+
 
+def _write_scatter_xml(root: ET.Element, path: Path) -> None:
+    with path.open('w', encoding='utf-8', errors='xmlcharrefreplace') as fh:
+        fh.write("<?xml version='1.0' encoding='utf-8'?>\n")
+        _write_xml_element(fh.write, root)
 
-def _convert_source_to_xml(scatter_source: Path, platform: str) -> Path:
+
+def _read_scatter_source(scatter_source: Path) -> bytes:
+    suffix = scatter_source.suffix.lower()
+    if suffix == '.xml':
+        text = scatter_source.read_text(encoding='utf-8', errors='ignore')
+    elif suffix == '.x':
+        text = decrypt_scatter_x(scatter_source).decode('utf-8', errors='ignore')
+    else:
+        raise ValueError('unsupported scatter source')
+    return text.encode('utf-8')
+
+
+class PartitionRecord:
+    __slots__ = ('elem', 'name', 'lower', 'base', 'slot', 'storage', '_fields')
+
+    def __init__(self, elem: ET.Element, name: str) -> None:
+        self.elem = elem
+        self.name = name
+        self.lower = name.lower()
+        if self.lower.endswith('_a') or self.lower.endswith('_b'):
+            self.base = self.lower[:-2]
+            self.slot = self.lower[-1]
+        else:
+            self.base = self.lower
+            self.slot = ''
+        fields: dict[str, ET.Element] = {}
+        for child in elem:
+            fields.setdefault(child.tag, child)
+        self._fields = fields
+        storage_el = fields.get('storage')
+        self.storage = (storage_el.text or '').strip() if storage_el is not None else None
+
+    def get(self, tag: str) -> str:
+        elem = self._fields.get(tag)
+        if elem is None or elem.text is None:
+            return ''
+        return elem.text.strip()
+
+    def field(self, tag: str) -> ET.Element:
+        elem = self._fields.get(tag)
+        if elem is None:
+            elem = ET.SubElement(self.elem, tag)
+            self._fields[tag] = elem
+        return elem
+
+    def set(self, tag: str, text: str) -> ET.Element:
+        elem = self.field(tag)
+        elem.text = text
+        return elem
+
+
+class PartitionIndex:
+    def __init__(self, entries) -> None:
+        self.records: list[PartitionRecord] = []
+        self.by_name: dict[str, list[PartitionRecord]] = {}
+        self.by_slot: dict[tuple[str, str], PartitionRecord] = {}
+        self.by_storage: dict[tuple[str, str, str], PartitionRecord] = {}
+        for part, name in entries:
+            rec = PartitionRecord(part, name)
+            self.records.append(rec)
+            self.by_name.setdefault(rec.lower, []).append(rec)
+            if rec.slot:
+                self.by_slot[(rec.base, rec.slot)] = rec
+                if rec.storage is not None:
+                    self.by_storage[(rec.base, rec.slot, rec.storage)] = rec
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def named(self, lower_name: str) -> list[PartitionRecord]:
+        return self.by_name.get(lower_name, [])
+
+
+class ScatterDocument:
+    def __init__(self, tree: ET.ElementTree, platform: str, source: Path | None = None, index: PartitionIndex | None = None) -> None:
+        self.tree = tree
+        self.platform = platform
+        self.path = IMAGE_DIR / f'{platform}_Android_scatter.xml'
+        self.source = source
+        self._index = index
+
+    @property
+    def root(self) -> ET.Element:
+        return self.tree.getroot()
+
+    @property
+    def partitions(self) -> PartitionIndex:
+        if self._index is None:
+            self._index = PartitionIndex(_iter_partitions(self.root))
+        return self._index
+
+    def save(self) -> Path:
+        _write_scatter_xml(self.root, self.path)
+        invalidate_image_index(self.path.parent)
+        hw = (getattr(adb_state, 'LAST_DEVICE_MODEL', '') or self.platform).strip() or self.platform
+        log('scatter.final_saved', hw=hw)
+        return self.path
+
+
+def load_scatter_document(scatter_source: Path, platform: str, log_convert: bool = True) -> ScatterDocument:
     xml_path = IMAGE_DIR / f'{platform}_Android_scatter.xml'
-    if scatter_source.is_file():
-        try:
-            if scatter_source.resolve() == xml_path.resolve():
-                return xml_path
-        except Exception:
-            pass
-    log('scatter.convert', path=str(scatter_source))
     try:
-        xml_text: str | None = None
-        suffix = scatter_source.suffix.lower()
-        if suffix == '.xml':
-            xml_text = scatter_source.read_text(encoding='utf-8', errors='ignore')
-        elif suffix == '.x':
-            decrypted = decrypt_scatter_x(scatter_source)
-            xml_text = decrypted.decode('utf-8', errors='ignore')
+        converting = log_convert and scatter_source.resolve() != xml_path.resolve()
+    except Exception:
+        converting = log_convert
+    if converting:
+        log('scatter.convert', path=str(scatter_source))
+    index: PartitionIndex | None = None
+    try:
+        if scatter_source.suffix.lower() == '.txt':
+            root, entries = _load_text_scatter(scatter_source)
+            index = PartitionIndex(entries)
         else:
-            raise ValueError('unsupported scatter source')
-        xml_path.write_text(xml_text or '', encoding='utf-8')
+            root = ET.fromstring(_read_scatter_source(scatter_source))
     except Exception:
         log('scatter.convert_failed')
         raise
-    log('scatter.convert_done', path=str(xml_path))
-    return xml_path
-
-def _create_ab_scatter(xml_path: Path) -> Path:
-    log('scatter.create_ab')
-    ab_path = IMAGE_DIR / 'Android_scatter_A,B.xml'
-    shutil.copy2(xml_path, ab_path)
-    return ab_path
+    if converting:
+        log('scatter.convert_done', path=str(xml_path))
+    return ScatterDocument(ET.ElementTree(root), platform, scatter_source, index)
 
 def _iter_partitions(root: ET.Element):
     for tag in ('partition', 'partition_index'):
@@ -172,76 +354,26 @@ def _iter_partitions(root: ET.Element):
                 continue
             yield (part, name)
 
-def _ensure_child_text(parent: ET.Element, tag: str, text: str | None = None) -> ET.Element:
-    elem = parent.find(tag)
-    if elem is None:
-        elem = ET.SubElement(parent, tag)
-    if text is not None:
-        elem.text = text
-    return elem
-
-
-def _get_text(parent: ET.Element, tag: str) -> str:
-    elem = parent.find(tag)
-    if elem is None or elem.text is None:
-        return ''
-    return elem.text.strip()
 
-def _set_text(parent: ET.Element, tag: str, text: str) -> ET.Element:
-    return _ensure_child_text(parent, tag, text)
+def _apply_download_profile(index: PartitionIndex, profile: DownloadProfile) -> None:
+    enabled = profile.enabled_set(index)
+    for rec in index:
+        if rec in enabled:
+            if profile.keep_source_flags:
+                continue
+            value = 'true'
+        else:
+            value = 'false'
+        rec.set('is_download', value)
+        rec.set('is_upgradable', value)
 
 
+def _disable_none_file_partitions(index: PartitionIndex) -> None:
+    _apply_download_profile(index, _DOWNLOAD_PROFILES['ROW'])
 
-def _cleanup_temp_scatter(xml_path: Path, ab_path: Path, preserve: tuple[Path, ...] = ()) -> None:
-    preserve_set = set()
-    for item in preserve:
-        try:
-            preserve_set.add(item.resolve())
-        except Exception:
-            pass
-    for path in (xml_path, ab_path):
-        try:
-            if path.resolve() in preserve_set:
-                continue
-        except Exception:
-            pass
-        try:
-            if path.is_file():
-                path.unlink()
-        except Exception:
-            pass
 
-def _disable_none_file_partitions(root: ET.Element) -> None:
-    for part, _name in _iter_partitions(root):
-        file_name = _get_text(part, 'file_name')
-        if file_name.upper() == 'NONE':
-            _ensure_child_text(part, 'is_download', 'false')
-            _ensure_child_text(part, 'is_upgradable', 'false')
-
-
-def _apply_prc_download_profile(root: ET.Element) -> None:
-    for part, name in _iter_partitions(root):
-        lower = name.lower()
-        is_enabled = _is_prc_partition_enabled(lower)
-        file_name = _get_text(part, 'file_name')
-        if file_name.upper() == 'NONE':
-            is_enabled = False
-        value = 'true' if is_enabled else 'false'
-        _ensure_child_text(part, 'is_download', value)
-        _ensure_child_text(part, 'is_upgradable', value)
-    _disable_none_file_partitions(root)
-
-
-def _apply_prc_download_profile_file(scatter_path: Path) -> None:
-    if not scatter_path.is_file():
-        return
-    try:
-        tree = ET.parse(scatter_path)
-    except ET.ParseError:
-        return
-    root = tree.getroot()
-    _apply_prc_download_profile(root)
-    tree.write(scatter_path, encoding='utf-8', xml_declaration=True)
+def _apply_prc_download_profile(index: PartitionIndex, raw_model: str = '') -> None:
+    _apply_download_profile(index, _download_profile('PRC', raw_model))
 
 
 def _resolve_lkdtbo_model(raw_model: str) -> str | None:
@@ -256,253 +388,198 @@ def _should_enable_lkdtbo_for_model(raw_model: str) -> bool:
     return model in {'TB375FC', 'TB373FU'}
 
 
-def _apply_model_lkdtbo_partitions(root: ET.Element, raw_model: str, prc_context: bool) -> bool:
+def _apply_model_lkdtbo_partitions(index: PartitionIndex, raw_model: str, prc_context: bool) -> bool:
     enable = _should_enable_lkdtbo_for_model(raw_model)
+    value = 'true' if enable else 'false'
     updated = False
-    for part, name in _iter_partitions(root):
-        low = name.lower()
-        if low in {'lk_a', 'lk_b', 'dtbo_a', 'dtbo_b'}:
-            _set_text(part, 'file_name', name)
-            value = 'true' if enable else 'false'
-            _set_text(part, 'is_download', value)
-            _set_text(part, 'is_upgradable', value)
+    for name in ('lk_a', 'lk_b', 'dtbo_a', 'dtbo_b'):
+        for rec in index.named(name):
+            rec.set('file_name', rec.name)
+            rec.set('is_download', value)
+            rec.set('is_upgradable', value)
             updated = True
     return updated
 
-def ensure_prc_platform_scatter(platform: str, preserve_userdata_false: bool = False) -> None:
-    if not _is_prc_context_any():
-        return
-    scatter_path = IMAGE_DIR / f'{platform}_Android_scatter.xml'
-    if not scatter_path.is_file():
-        return
-    try:
-        tree = ET.parse(scatter_path)
-    except ET.ParseError:
-        return
-    root = tree.getroot()
-    preserve_proinfo = None
-    preserve_userdata = None
+def _device_model() -> str:
     raw_model = getattr(adb_state, 'LAST_DEVICE_MODEL', '') or ''
     if not raw_model:
         try:
             raw_model = adb_shell_getprop('ro.product.model').strip()
         except Exception:
             raw_model = ''
-    for part, name in _iter_partitions(root):
-        lower = name.lower()
-        if lower == 'proinfo':
-            preserve_proinfo = (_get_text(part, 'is_download') or '').lower()
-        elif lower == 'userdata':
-            preserve_userdata = (_get_text(part, 'is_download') or '').lower()
-    _apply_prc_download_profile(root)
-    _apply_model_lkdtbo_partitions(root, raw_model, True)
-    _disable_none_file_partitions(root)
-    for part, name in _iter_partitions(root):
-        lower = name.lower()
-        if lower == 'proinfo' and preserve_proinfo == 'true':
-            _ensure_child_text(part, 'is_download', 'true')
-        elif lower == 'userdata' and preserve_userdata_false and preserve_userdata == 'false':
-            _ensure_child_text(part, 'is_download', 'false')
-    tree.write(scatter_path, encoding='utf-8', xml_declaration=True)
-
-
-def _patch_proinfo(ab_scatter: Path, final_name: str, keep_user_data: bool) -> Path:
-    tree = ET.parse(ab_scatter)
-    root = tree.getroot()
+    return raw_model
+
+
+def _apply_prc_platform_profile(index: PartitionIndex, raw_model: str, preserve_userdata_false: bool) -> None:
+    preserve_proinfo = None
+    preserve_userdata = None
+    for rec in index.named('proinfo'):
+        preserve_proinfo = rec.get('is_download').lower()
+    for rec in index.named('userdata'):
+        preserve_userdata = rec.get('is_download').lower()
+    _apply_prc_download_profile(index, raw_model)
+    _apply_model_lkdtbo_partitions(index, raw_model, True)
+    _disable_none_file_partitions(index)
+    if preserve_proinfo == 'true':
+        for rec in index.named('proinfo'):
+            rec.set('is_download', 'true')
+    if preserve_userdata_false and preserve_userdata == 'false':
+        for rec in index.named('userdata'):
+            rec.set('is_download', 'false')
+
+
+def ensure_prc_platform_scatter(doc: ScatterDocument, preserve_userdata_false: bool = False) -> None:
+    if not _is_prc_context_any():
+        return
+    _apply_prc_platform_profile(doc.partitions, _device_model(), preserve_userdata_false)
+
+
+def _patch_proinfo(index: PartitionIndex, keep_user_data: bool, prc_context: bool, raw_model: str = '') -> None:
     found_proinfo = False
-    found_userdata = False
-    for part, name in _iter_partitions(root):
-        lower = name.lower()
-        if lower == 'proinfo':
-            _ensure_child_text(part, 'file_name', 'proinfo')
-            _ensure_child_text(part, 'is_download', 'true')
-            _ensure_child_text(part, 'is_upgradable', 'true')
-            found_proinfo = True
-        if keep_user_data and lower == 'userdata':
-            _ensure_child_text(part, 'file_name', 'userdata.img')
-            _ensure_child_text(part, 'is_download', 'false')
-            _ensure_child_text(part, 'is_upgradable', 'false')
-            found_userdata = True
-    ab_slots: dict[str, dict[str, ET.Element]] = {}
-    for part, name in _iter_partitions(root):
-        lower = name.lower()
-        if lower.endswith('_a') or lower.endswith('_b'):
-            base = lower[:-2]
-            slot = lower[-1]
-            ab_slots.setdefault(base, {})[slot] = part
+    for rec in index.named('proinfo'):
+        rec.set('file_name', 'proinfo')
+        rec.set('is_download', 'true')
+        rec.set('is_upgradable', 'true')
+        found_proinfo = True
+    if keep_user_data:
+        for rec in index.named('userdata'):
+            rec.set('file_name', 'userdata.img')
+            rec.set('is_download', 'false')
+            rec.set('is_upgradable', 'false')
     truthy = {'1', 'true', 'True', 'TRUE'}
-    for base, slots in ab_slots.items():
-        a = slots.get('a')
-        b = slots.get('b')
-        if not a or not b:
+    for (base, slot), a in index.by_slot.items():
+        if slot != 'a':
             continue
-        file_a = _ensure_child_text(a, 'file_name')
-        file_b = _ensure_child_text(b, 'file_name')
-        name_a = (file_a.text or '').strip()
-        name_b = (file_b.text or '').strip()
-        file_name = name_a or name_b
+        b = index.by_slot.get((base, 'b'))
+        if b is None:
+            continue
+        file_name = a.get('file_name') or b.get('file_name')
         if file_name and file_name.upper() != 'NONE':
-            file_a.text = file_name
-            file_b.text = file_name
-        dl_a = _ensure_child_text(a, 'is_download')
-        dl_b = _ensure_child_text(b, 'is_download')
-        up_a = _ensure_child_text(a, 'is_upgradable')
-        up_b = _ensure_child_text(b, 'is_upgradable')
-        dl_val_a = (dl_a.text or '').strip()
-        dl_val_b = (dl_b.text or '').strip()
-        up_val_a = (up_a.text or '').strip()
-        up_val_b = (up_b.text or '').strip()
-        dl_combined = 'true' if dl_val_a in truthy or dl_val_b in truthy else 'false'
-        up_combined = 'true' if up_val_a in truthy or up_val_b in truthy else 'false'
-        dl_a.text = dl_combined
-        dl_b.text = dl_combined
-        up_a.text = up_combined
-        up_b.text = up_combined
+            a.set('file_name', file_name)
+            b.set('file_name', file_name)
+        else:
+            a.field('file_name')
+            b.field('file_name')
         if base in ('boot', 'vbmeta'):
-            dl_a.text = 'true'
-            dl_b.text = 'true'
-            up_a.text = 'true'
-            up_b.text = 'true'
+            dl_combined = 'true'
+            up_combined = 'true'
+        else:
+            dl_combined = 'true' if a.get('is_download') in truthy or b.get('is_download') in truthy else 'false'
+            up_combined = 'true' if a.get('is_upgradable') in truthy or b.get('is_upgradable') in truthy else 'false'
+        a.set('is_download', dl_combined)
+        b.set('is_download', dl_combined)
+        a.set('is_upgradable', up_combined)
+        b.set('is_upgradable', up_combined)
     if not found_proinfo:
         log('scatter.proinfo_not_found')
-    _fix_ab_slots(root)
-    if _is_prc_context_any():
-        _apply_prc_download_profile(root)
-    _disable_none_file_partitions(root)
-    final_path = IMAGE_DIR / final_name
-    tree.write(final_path, encoding='utf-8', xml_declaration=True)
-    return final_path
-
+    _fix_ab_slots(index)
+    if prc_context:
+        _apply_prc_download_profile(index, raw_model)
+    _disable_none_file_partitions(index)
 
 
-
-
-def _fix_ab_slots(root: ET.Element) -> None:
-    parts_by_key: dict[tuple[str, str, str], ET.Element] = {}
-    for part, name in _iter_partitions(root):
-        storage_el = part.find('storage')
-        if storage_el is None:
-            continue
-        storage = (storage_el.text or '').strip()
-        if not (name.endswith('_a') or name.endswith('_b')):
-            continue
-        base = name[:-2]
-        suffix = name[-1]
+def _fix_ab_slots(index: PartitionIndex) -> None:
+    ref_info: dict[tuple[str, str], str] = {}
+    for (base, suffix, _storage), rec in index.by_storage.items():
         if base in ('lk', 'dtbo'):
             continue
-        key = (base, suffix, storage)
-        parts_by_key[key] = part
-    ref_info: dict[tuple[str, str], str] = {}
-    for (base, suffix, storage), part in parts_by_key.items():
-        file_el = part.find('file_name')
-        dl_el = part.find('is_download')
-        fname = (file_el.text or '').strip() if file_el is not None else ''
-        dl = (dl_el.text or '').strip().lower() if dl_el is not None else ''
+        fname = rec.get('file_name')
+        dl = rec.get('is_download').lower()
         if fname and fname.upper() != 'NONE' and dl != 'false':
             ref_info[(base, suffix)] = fname
     for (base, suffix), fname in ref_info.items():
         for storage in ('HW_STORAGE_EMMC', 'HW_STORAGE_UFS'):
-            part = parts_by_key.get((base, suffix, storage))
-            if part is None:
+            rec = index.by_storage.get((base, suffix, storage))
+            if rec is None:
                 continue
-            file_el = part.find('file_name')
-            if file_el is None:
-                file_el = ET.SubElement(part, 'file_name')
-            file_el.text = fname
-            dl_el = part.find('is_download')
-            if dl_el is None:
-                dl_el = ET.SubElement(part, 'is_download')
-            dl_el.text = 'true'
-            up_el = part.find('is_upgradable')
-            if up_el is None:
-                up_el = ET.SubElement(part, 'is_upgradable')
-            up_el.text = 'true'
-
-
-def apply_country_plan_to_proinfo(platform: str, enable: bool) -> None:
-    
-    scatter_xml = IMAGE_DIR / f"{platform}_Android_scatter.xml"
-    if not scatter_xml.is_file():
-        return
-    try:
-        tree = ET.parse(scatter_xml)
-    except ET.ParseError:
-        return
-    root = tree.getroot()
-    updated = False
-    for part, name in _iter_partitions(root):
-        if name.lower() == "proinfo":
-            if enable:
-                _ensure_child_text(part, "file_name", "proinfo")
-                _ensure_child_text(part, "is_download", "true")
-                _ensure_child_text(part, "is_upgradable", "true")
-            else:
-                _ensure_child_text(part, "file_name", "NONE")
-                _ensure_child_text(part, "is_download", "false")
-                _ensure_child_text(part, "is_upgradable", "false")
-            updated = True
-    if not updated:
+            rec.set('file_name', fname)
+            rec.set('is_download', 'true')
+            rec.set('is_upgradable', 'true')
+
+
+def apply_country_plan_to_proinfo(doc: ScatterDocument, enable: bool) -> None:
+    records = doc.partitions.named("proinfo")
+    for rec in records:
+        if enable:
+            rec.set("file_name", "proinfo")
+            rec.set("is_download", "true")
+            rec.set("is_upgradable", "true")
+        else:
+            rec.set("file_name", "NONE")
+            rec.set("is_download", "false")
+            rec.set("is_upgradable", "false")
+    if not records:
         log("scatter.proinfo_not_found")
-        return
-    tree.write(scatter_xml, encoding="utf-8", xml_declaration=True)
 
 
-def prepare_platform_scatter(platform: str, keep_user_data: bool) -> Path | None:
+def prepare_platform_scatter(platform: str, keep_user_data: bool) -> ScatterDocument | None:
     try:
         scatter_source = _find_scatter_source(platform)
     except FileNotFoundError:
         log('scatter.not_found')
         return None
     platform_scatter = IMAGE_DIR / f"{platform}_Android_scatter.xml"
-    preserve_existing = _is_prc_image_context() and platform_scatter.is_file()
+    platform_scatter_exists = get_image_index(IMAGE_DIR).is_file(platform_scatter.name)
+    preserve_existing = _is_prc_image_context() and platform_scatter_exists
     if preserve_existing:
-        xml_path = platform_scatter
+        scatter_source = platform_scatter
     else:
         try:
-            if platform_scatter.is_file() and scatter_source.resolve() != platform_scatter.resolve():
+            if platform_scatter_exists and scatter_source.resolve() != platform_scatter.resolve():
                 platform_scatter.unlink()
         except OSError:
             pass
-        xml_path = _convert_source_to_xml(scatter_source, platform)
-    ab_path = _create_ab_scatter(xml_path)
-    final_path = _patch_proinfo(ab_path, f'{platform}_Android_scatter.xml', keep_user_data)
-    hw = (getattr(adb_state, 'LAST_DEVICE_MODEL', '') or platform).strip() or platform
-    log('scatter.final_saved', hw=hw)
-    _cleanup_temp_scatter(xml_path, ab_path, preserve=(final_path,))
-    return final_path
-
-def disable_lk_dtbo_partitions(platform: str) -> None:
+    doc = load_scatter_document(scatter_source, platform)
+    _patch_proinfo(doc.partitions, keep_user_data, _is_prc_context_any(), getattr(adb_state, 'LAST_DEVICE_MODEL', '') or '')
+    return doc
+
+def _apply_lkdtbo_plan(index: PartitionIndex, raw_model: str, prc_context: bool) -> bool:
+    updated = _apply_model_lkdtbo_partitions(index, raw_model, prc_context)
+    _disable_none_file_partitions(index)
+    return updated
+
+
+def _apply_keep_data_plan(index: PartitionIndex) -> tuple[bool, bool]:
+    proinfo = index.named('proinfo')
+    userdata = index.named('userdata')
+    for rec in proinfo:
+        rec.set('file_name', 'proinfo')
+        rec.set('is_download', 'true')
+        rec.set('is_upgradable', 'true')
+    for rec in userdata:
+        rec.set('is_download', 'false')
+        rec.set('is_upgradable', 'false')
+    return bool(proinfo), bool(userdata)
+
+
+def patch_userdata_keep_data(doc: ScatterDocument) -> None:
+    proinfo, userdata = _apply_keep_data_plan(doc.partitions)
+    if not proinfo:
+        log('scatter.proinfo_not_found')
+    if not userdata:
+        log('scatter.userdata_not_found')
+    log('scatter.userdata_patched')
+
+
+def disable_lk_dtbo_partitions(doc: ScatterDocument) -> None:
+    image_index = get_image_index(IMAGE_DIR)
     for name in ('lk.img', 'dtbo.img'):
-        path = IMAGE_DIR / name
-        if path.exists():
+        if image_index.has(name):
             try:
-                path.unlink()
+                image_index.path(name).unlink()
             except OSError:
                 pass
-    scatter_xml = IMAGE_DIR / f'{platform}_Android_scatter.xml'
-    if not scatter_xml.is_file():
-        return
-    raw_model = getattr(adb_state, 'LAST_DEVICE_MODEL', '') or ''
-    if not raw_model:
-        try:
-            raw_model = adb_shell_getprop('ro.product.model').strip()
-        except Exception:
-            raw_model = ''
+    raw_model = _device_model()
     enable = _should_enable_lkdtbo_for_model(raw_model)
-    prc_context = _is_prc_context_any()
-    tree = ET.parse(scatter_xml)
-    root = tree.getroot()
-    updated = _apply_model_lkdtbo_partitions(root, raw_model, prc_context)
-    _disable_none_file_partitions(root)
+    updated = _apply_lkdtbo_plan(doc.partitions, raw_model, _is_prc_context_any())
     if updated:
-        tree.write(scatter_xml, encoding='utf-8', xml_declaration=True)
-        log('scatter.lk_dtbo_enabled' if enable else 'scatter.lk_dtbo_disabled', path=str(scatter_xml))
+        log('scatter.lk_dtbo_enabled' if enable else 'scatter.lk_dtbo_disabled', path=str(doc.path))
 
 
 def backup_platform_scatter_to_logs(platform: str) -> None:
     try:
         src = IMAGE_DIR / f"{platform}_Android_scatter.xml"
-        if not src.is_file():
+        if not get_image_index(IMAGE_DIR).is_file(src.name):
             return
         if _is_prc_context_any():
             return
@@ -514,28 +591,53 @@ def backup_platform_scatter_to_logs(platform: str) -> None:
         return
 
 def prepare_country_reset_scatter(platform: str) -> Path | None:
-    scatter_path = prepare_platform_scatter(platform, keep_user_data=False)
-    if scatter_path is None or not scatter_path.is_file():
-        return None
     try:
-        tree = ET.parse(scatter_path)
+        doc = prepare_platform_scatter(platform, keep_user_data=False)
     except ET.ParseError:
         return None
-    root = tree.getroot()
-    found = False
-    for part, name in _iter_partitions(root):
-        low = name.lower()
-        for elem in part.iter():
-            if elem is part:
+    if doc is None:
+        return None
+    index = doc.partitions
+    for rec in index:
+        for elem in rec.elem.iter():
+            if elem is rec.elem:
                 continue
             if (elem.text or '').strip().lower() == 'true':
                 elem.text = 'false'
-        if low == 'proinfo':
-            _ensure_child_text(part, 'file_name', 'proinfo')
-            _ensure_child_text(part, 'is_download', 'true')
-            found = True
-    if not found:
+    records = index.named('proinfo')
+    for rec in records:
+        rec.set('file_name', 'proinfo')
+        rec.set('is_download', 'true')
+    if not records:
         log('scatter.proinfo_not_found')
         return None
-    tree.write(scatter_path, encoding='utf-8', xml_declaration=True)
-    return scatter_path
+    return doc.save()
+
+
+def _partition_plan_row(rec: PartitionRecord) -> tuple[str, str, str]:
+    return (rec.get('file_name'), rec.get('is_download').lower(), rec.get('is_upgradable').lower())
+
+
+def plan_platform_scatter(platform: str, keep_user_data: bool, raw_model: str, image_region: str, device_region: str, country_plan: bool = False) -> tuple[ScatterDocument, list[tuple[PartitionRecord, tuple[str, str, str], tuple[str, str, str]]]]:
+    image_region = (image_region or '').strip().upper()
+    device_region = (device_region or '').strip().upper()
+    prc_context = image_region == 'PRC' or device_region == 'PRC'
+    scatter_source = _find_scatter_source(platform)
+    platform_scatter = IMAGE_DIR / f"{platform}_Android_scatter.xml"
+    if image_region == 'PRC' and get_image_index(IMAGE_DIR).is_file(platform_scatter.name):
+        scatter_source = platform_scatter
+    doc = load_scatter_document(scatter_source, platform, log_convert=False)
+    index = doc.partitions
+    before = [_partition_plan_row(rec) for rec in index]
+    _patch_proinfo(index, keep_user_data, prc_context, raw_model)
+    _apply_lkdtbo_plan(index, raw_model, prc_context)
+    if keep_user_data:
+        _apply_keep_data_plan(index)
+    apply_country_plan_to_proinfo(doc, country_plan)
+    if prc_context:
+        _apply_prc_platform_profile(index, raw_model, keep_user_data)
+    plan = [
+        (rec, old, _partition_plan_row(rec))
+        for rec, old in zip(index.records, before)
+    ]
+    return doc, plan
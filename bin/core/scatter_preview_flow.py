@@ -0,0 +1,79 @@
+from __future__ import annotations
+from . import adb_utils as adb_state
+from .constants import IMAGE_DIR
+from .firmware_guard import inspect_vendor_boot_image, inspect_flash_xml_platform
+from .global_flow import _country_code_feature_enabled
+from .image_index import image_folder_ready
+from .i18n import get_string
+from .scatter import plan_platform_scatter
+from .utils import clear_console, log, log_text, log_model_value
+
+
+def _inspect_image_folder_preview() -> tuple[str, str, str] | None:
+    log('flow.firmware_version_detecting')
+    if not image_folder_ready(IMAGE_DIR):
+        log('flow.image_folder_missing')
+        return None
+    info = inspect_vendor_boot_image()
+    model = (info.get('model') or '').strip().upper()
+    version = (info.get('version') or '').strip().upper()
+    rom_region = (info.get('rom_region') or '').strip().upper()
+    if not model or not version or rom_region not in {'PRC', 'ROW'}:
+        log('flow.firmware_version_not_found')
+        return None
+    platform = (inspect_flash_xml_platform() or '').strip().upper()
+    if not platform:
+        log('flow.flash_xml_missing')
+        return None
+    model = log_model_value('flow.reinstall.model', model, field_name='model')
+    adb_state.LAST_IMAGE_MODEL = model
+    adb_state.LAST_IMAGE_VERSION = version
+    adb_state.LAST_IMAGE_ROM_REGION = rom_region
+    adb_state.LAST_IMAGE_PLATFORM = platform
+    if rom_region == 'ROW':
+        log('flow.reinstall.image_folder_row')
+    else:
+        log('flow.reinstall.image_folder_prc')
+    log('flow.reinstall.version', version=version)
+    log('flow.reinstall.platform', platform=platform)
+    return model, rom_region, platform
+
+
+def _format_plan_row(row: tuple[str, str, str]) -> str:
+    file_name, is_download, is_upgradable = row
+    return f"{file_name or '-'} dl={is_download or '-'} up={is_upgradable or '-'}"
+
+
+def _log_scatter_plan(title_key: str, platform: str, keep_user_data: bool, model: str, image_region: str, device_region: str, country_plan: bool) -> None:
+    log_text(f"--- [{get_string(title_key)}] ---")
+    try:
+        doc, plan = plan_platform_scatter(platform, keep_user_data, model, image_region, device_region, country_plan)
+    except Exception:
+        log('flow.preview.failed')
+        return
+    if doc.source is not None:
+        log('flow.preview.source', path=doc.source.name)
+    changed = [(rec, old, new) for rec, old, new in plan if old != new]
+    width = max((len(rec.name) for rec, _old, _new in changed), default=0)
+    for rec, old, new in changed:
+        storage = f" [{rec.storage}]" if rec.storage else ''
+        log_text(f"  {rec.name.ljust(width)}{storage}: {_format_plan_row(old)} -> {_format_plan_row(new)}")
+    if not changed:
+        log('flow.preview.no_changes')
+    download = sum(1 for _rec, _old, new in plan if new[1].lower() == 'true')
+    log('flow.preview.summary', total=len(plan), changed=len(changed), download=download)
+
+
+def run_scatter_preview_flow() -> None:
+    clear_console()
+    log('app.menu.separator')
+    log('flow.preview.start')
+    log('app.menu.separator')
+    inspected = _inspect_image_folder_preview()
+    if inspected is None:
+        return
+    model, rom_region, platform = inspected
+    country_plan = _country_code_feature_enabled()
+    _log_scatter_plan('app.menu.option1', platform, False, model, rom_region, 'PRC', country_plan)
+    if rom_region == 'ROW':
+        _log_scatter_plan('app.menu.option2', platform, True, model, rom_region, 'ROW', country_plan)
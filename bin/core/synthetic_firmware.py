@@ -0,0 +1,351 @@
+from __future__ import annotations
+import argparse
+import gzip
+import hashlib
+import random
+import struct
+import sys
+from pathlib import Path
+from .proinfo import COUNTRIES
+
+AB_PARTITIONS = [
+    'preloader', 'vbmeta', 'vbmeta_system', 'vbmeta_vendor', 'spmfw', 'audio_dsp', 'pi_img',
+    'dpm', 'scp', 'ccu', 'vcp', 'sspm', 'mcupm', 'gpueb', 'apusys', 'mvpu_algo', 'gz', 'lk',
+    'boot', 'vendor_boot', 'init_boot', 'dtbo', 'tee', 'connsys_bt', 'connsys_wifi',
+    'connsys_gnss', 'logo', 'md1img', 'efuse',
+]
+SINGLE_PARTITIONS = [
+    'proinfo', 'nvram', 'protect1', 'protect2', 'persist', 'seccfg', 'nvcfg', 'nvdata',
+    'metadata', 'frp', 'para', 'expdb', 'lenovocust', 'lenovoraw', 'super', 'userdata',
+]
+STORAGE_TYPES = ('HW_STORAGE_EMMC', 'HW_STORAGE_UFS')
+SCATTER_FORMATS = ('xml', 'txt', 'x')
+PROINFO_SIZE = 0x300000
+PROINFO_SERIAL_SIZE = 64
+PROINFO_COUNTRY_OFFSET = 0x1000
+VENDOR_BOOT_PAGE_SIZE = 4096
+RAMDISK_COMPRESSIONS = ('gzip', 'lz4', 'none')
+_FILL_BLOCK_SIZE = 1 << 20
+_LZ4_LEGACY_MAGIC = 0x184C2102
+_LZ4_LEGACY_BLOCK_SIZE = 8 << 20
+_RAMDISK_TABLE_ENTRY = struct.Struct('<III32s64s')
+
+
+def _parse_size(value: str) -> int:
+    text = (value or '').strip().upper().rstrip('B')
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    scale = 1
+    if text and text[-1] in units:
+        scale = units[text[-1]]
+        text = text[:-1]
+    return int(float(text) * scale)
+
+
+def _fill_block(seed: int, name: str) -> bytes:
+    rng = random.Random(f'{seed}:{name}')
+    return rng.randbytes(_FILL_BLOCK_SIZE)
+
+
+def _write_filled(path: Path, size: int, block: bytes) -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    with path.open('wb') as fh:
+        remaining = size
+        while remaining > 0:
+            chunk = block[:remaining]
+            fh.write(chunk)
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def _partition_names(count: int) -> list[str]:
+    names: list[str] = []
+    for base in AB_PARTITIONS:
+        names += [f'{base}_a', f'{base}_b']
+    names += SINGLE_PARTITIONS
+    extra = 0
+    while len(names) < count:
+        names += [f'extra{extra}_a', f'extra{extra}_b']
+        extra += 1
+    if len(names) > count:
+        required = ['proinfo', 'super', 'userdata']
+        names = [name for name in names if name not in required][:max(count - len(required), 0)] + required
+    return names
+
+
+def _file_name_for(name: str) -> str:
+    if name[-2:] in ('_a', '_b'):
+        return name[:-2] + '.img'
+    return name + '.img'
+
+
+def build_partition_table(count: int, seed: int = 0, storages: tuple[str, ...] = STORAGE_TYPES) -> list[dict[str, str]]:
+    rng = random.Random(seed)
+    rows: list[dict[str, str]] = []
+    names = _partition_names(count)
+    for storage in storages:
+        for name in names:
+            if name.endswith('_b') and rng.random() < 0.5:
+                file_name = 'NONE'
+            elif name.startswith(('protect', 'nvram', 'nvdata', 'nvcfg', 'expdb', 'para', 'frp')):
+                file_name = 'NONE'
+            else:
+                file_name = _file_name_for(name)
+            rows.append({
+                'partition_index': f'SYS{len(rows)}',
+                'partition_name': name,
+                'file_name': file_name,
+                'is_download': 'true' if file_name != 'NONE' and rng.random() < 0.7 else 'false',
+                'type': 'NORMAL_ROM',
+                'storage': storage,
+                'is_upgradable': 'true' if rng.random() < 0.5 else 'false',
+                'is_reserved': 'false',
+            })
+    return rows
+
+
+def render_scatter_xml(rows: list[dict[str, str]], platform: str) -> bytes:
+    out = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<scatter>',
+        '  <general>',
+        '    <config_version>V2.1.0</config_version>',
+        f'    <platform>{platform}</platform>',
+        '  </general>',
+    ]
+    storage = None
+    for row in rows:
+        if row['storage'] != storage:
+            if storage is not None:
+                out.append('  </storage_type>')
+            storage = row['storage']
+            out.append(f'  <storage_type name="{storage}">')
+        out.append(f'    <partition_index name="{row["partition_index"]}">')
+        for key, value in row.items():
+            if key != 'partition_index':
+                out.append(f'      <{key}>{value}</{key}>')
+        out.append('    </partition_index>')
+    if storage is not None:
+        out.append('  </storage_type>')
+    out.append('</scatter>')
+    return ('\n'.join(out) + '\n').encode('utf-8')
+
+
+def render_scatter_txt(rows: list[dict[str, str]], platform: str) -> bytes:
+    out = [
+        '############',
+        '# General Setting',
+        '############',
+        '- general: MTK_PLATFORM_CFG',
+        '  info:',
+        '    - config_version: V1.1.2',
+        f'      platform: {platform}',
+        '',
+    ]
+    for row in rows:
+        out.append(f'- partition_index: {row["partition_index"]}')
+        for key, value in row.items():
+            if key != 'partition_index':
+                out.append(f'  {key}: {value}')
+        out.append('')
+    return '\n'.join(out).encode('utf-8')
+
+
+def render_flash_xml(platform: str) -> bytes:
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<flashtool-config version="2.0">\n'
+        '  <general>\n'
+        f'    <chip-name>{platform}</chip-name>\n'
+        '    <storage-type>UFS</storage-type>\n'
+        '    <download-agent>DA_BR.bin</download-agent>\n'
+        f'    <scatter>../{platform}_Android_scatter.xml</scatter>\n'
+        '  </general>\n'
+        '</flashtool-config>\n'
+    ).encode('utf-8')
+
+
+def _cpio_newc(files: list[tuple[str, bytes]]) -> bytes:
+    out = bytearray()
+    for ino, (name, data) in enumerate(files + [('TRAILER!!!', b'')], start=1):
+        raw_name = name.encode('utf-8') + b'\0'
+        mode = 0 if name == 'TRAILER!!!' else 0o100644
+        fields = (ino, mode, 0, 0, 1, 0, len(data), 0, 0, 0, 0, len(raw_name), 0)
+        out += b'070701' + ''.join(f'{value:08X}' for value in fields).encode('ascii')
+        out += raw_name + b'\0' * (-(len(out) + len(raw_name)) % 4)
+        out += data + b'\0' * (-(len(out) + len(data)) % 4)
+    return bytes(out)
+
+
+def _lz4_legacy_literals(data: bytes) -> bytes:
+    out = bytearray(struct.pack('<I', _LZ4_LEGACY_MAGIC))
+    for start in range(0, len(data), _LZ4_LEGACY_BLOCK_SIZE) or [0]:
+        block = data[start:start + _LZ4_LEGACY_BLOCK_SIZE]
+        encoded = bytearray()
+        if len(block) >= 15:
+            encoded.append(0xF0)
+            rest = len(block) - 15
+            while rest >= 255:
+                encoded.append(255)
+                rest -= 255
+            encoded.append(rest)
+        else:
+            encoded.append(len(block) << 4)
+        encoded += block
+        out += struct.pack('<I', len(encoded)) + encoded
+    return bytes(out)
+
+
+def _compress_ramdisk(data: bytes, compression: str) -> bytes:
+    if compression == 'gzip':
+        return gzip.compress(data, mtime=0)
+    if compression == 'lz4':
+        return _lz4_legacy_literals(data)
+    return data
+
+
+def _pad_page(data: bytes) -> bytes:
+    return data + b'\0' * (-len(data) % VENDOR_BOOT_PAGE_SIZE)
+
+
+def render_vendor_boot(model: str, version: str, region: str, size: int, seed: int = 0, repeats: int = 4, compression: str = 'gzip') -> bytes:
+    region = region.upper()
+    tag = 'CN_OPEN_USER' if region == 'PRC' else 'ROW_OPEN_USER'
+    markers = [
+        f'ro.product.vendor.model={model}\n'.encode('ascii'),
+        f'ro.vendor.build.version.incremental={version}\n'.encode('ascii'),
+        f'ro.vendor.build.display.id={model}_{version}_{tag}\n'.encode('ascii'),
+    ]
+    build_prop = b''.join(markers) + f'ro.config.zui.region={region}\n'.encode('ascii')
+    platform_ramdisk = _compress_ramdisk(_cpio_newc([
+        ('first_stage_ramdisk', b''),
+        ('system/etc/ramdisk/build.prop', build_prop),
+        ('init.recovery.mt6897.rc', b'on init\n'),
+    ]), compression)
+    rng = random.Random(f'{seed}:vendor_boot')
+    dlkm_ramdisk = _compress_ramdisk(_cpio_newc([
+        ('lib/modules/synthetic.ko', rng.randbytes(64 << 10)),
+    ]), compression)
+    ramdisk = platform_ramdisk + dlkm_ramdisk
+    table = b''.join([
+        _RAMDISK_TABLE_ENTRY.pack(len(platform_ramdisk), 0, 1, b'platform', b''),
+        _RAMDISK_TABLE_ENTRY.pack(len(dlkm_ramdisk), len(platform_ramdisk), 3, b'dlkm', b''),
+    ])
+    config = b'androidboot.hardware=mt6897\nandroidboot.selinux=permissive\n'
+    bootconfig = config + struct.pack('<II', len(config), sum(config) & 0xFFFFFFFF) + b'#BOOTCONFIG\n'
+    header = struct.pack(
+        '<8sIIIII2048sI16sIIQIIII',
+        b'VNDRBOOT', 4, VENDOR_BOOT_PAGE_SIZE, 0x40000000, 0x51000000, len(ramdisk),
+        b'bootopt=64S3,32N2,64N2', 0x47C80000, b'', 2128, 0, 0x47C80000,
+        len(table), 2, _RAMDISK_TABLE_ENTRY.size, len(bootconfig),
+    )
+    fixed = len(_pad_page(header)) + len(_pad_page(ramdisk)) + len(_pad_page(table)) + len(_pad_page(bootconfig))
+    dtb_size = max(size - fixed, sum(len(m) for m in markers) * repeats + 1)
+    dtb = bytearray(_fill_block(seed, 'vendor_boot'))
+    while len(dtb) < dtb_size:
+        dtb += dtb[:dtb_size - len(dtb)]
+    del dtb[dtb_size:]
+    step = dtb_size // (repeats * len(markers) + 1)
+    pos = step
+    for _ in range(repeats):
+        for marker in markers:
+            dtb[pos:pos + len(marker)] = marker
+            pos += step
+    header = header[:2100] + struct.pack('<I', dtb_size) + header[2104:]
+    return b''.join([_pad_page(header), _pad_page(ramdisk), _pad_page(bytes(dtb)), _pad_page(table), _pad_page(bootconfig)])
+
+
+def render_proinfo(serial: str, country: str, size: int = PROINFO_SIZE) -> bytes:
+    data = bytearray(size)
+    raw_serial = serial.encode('ascii')[:PROINFO_SERIAL_SIZE]
+    data[:len(raw_serial)] = raw_serial
+    token = (country.upper() + 'XX').encode('ascii')
+    data[PROINFO_COUNTRY_OFFSET:PROINFO_COUNTRY_OFFSET + len(token)] = token
+    return bytes(data)
+
+
+def generate_firmware_tree(
+    base_dir: Path | str,
+    platform: str = 'MT6897',
+    model: str = 'TB375FC',
+    version: str = 'ZUI_17.0.10.308_ST',
+    region: str = 'ROW',
+    partitions: int = 90,
+    image_size: int = 1 << 20,
+    vendor_boot_size: int = 64 << 20,
+    ramdisk_compression: str = 'gzip',
+    scatter_formats: tuple[str, ...] = SCATTER_FORMATS,
+    country: str = 'KR',
+    seed: int = 0,
+) -> Path:
+    base = Path(base_dir)
+    image_dir = base / 'image'
+    agent_dir = image_dir / 'download_agent'
+    agent_dir.mkdir(parents=True, exist_ok=True)
+    platform = platform.upper()
+    rows = build_partition_table(partitions, seed)
+    xml_payload = render_scatter_xml(rows, platform)
+    if 'xml' in scatter_formats:
+        (image_dir / f'{platform}_Android_scatter.xml').write_bytes(xml_payload)
+    if 'txt' in scatter_formats:
+        (image_dir / f'{platform}_Android_scatter.txt').write_bytes(render_scatter_txt(rows, platform))
+    if 'x' in scatter_formats:
+        from .xml_crypto import encrypt_scatter_x
+        rng = random.Random(f'{seed}:scatter.x')
+        encrypted = encrypt_scatter_x(xml_payload, iv=rng.randbytes(16), salt=rng.randbytes(16))
+        (image_dir / f'{platform}_Android_scatter.x').write_bytes(encrypted)
+    (agent_dir / 'flash.xml').write_bytes(render_flash_xml(platform))
+    (agent_dir / 'DA_BR.bin').write_bytes(hashlib.sha256(f'{seed}:DA_BR'.encode('ascii')).digest() * 64)
+    (image_dir / 'vendor_boot-debug.img').write_bytes(render_vendor_boot(model, version, region, vendor_boot_size, seed, compression=ramdisk_compression))
+    checksums = ['[VERSION]', 'Version=V1.0.0', '[CheckSum]']
+    for file_name in sorted({row['file_name'] for row in rows if row['file_name'] != 'NONE'}):
+        digest = _write_filled(image_dir / file_name, image_size, _fill_block(seed, file_name))
+        checksums.append(f'{file_name}={digest}')
+    (image_dir / 'Checksum.ini').write_text('\n'.join(checksums) + '\n', encoding='ascii')
+    readback_dir = base / 'tools' / 'Readback'
+    readback_dir.mkdir(parents=True, exist_ok=True)
+    serial = hashlib.sha256(f'{seed}:serial'.encode('ascii')).hexdigest()[:16].upper()
+    (readback_dir / 'proinfo').write_bytes(render_proinfo(serial, country))
+    return image_dir
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m core.synthetic_firmware')
+    parser.add_argument('base_dir', help='output directory; image/ and tools/Readback/ are created inside it')
+    parser.add_argument('--platform', default='MT6897')
+    parser.add_argument('--model', default='TB375FC')
+    parser.add_argument('--version', default='ZUI_17.0.10.308_ST')
+    parser.add_argument('--region', default='ROW', choices=('PRC', 'ROW'), type=str.upper)
+    parser.add_argument('--partitions', default=90, type=int, help='partitions per storage type')
+    parser.add_argument('--image-size', default='1M', help='size of each partition image (e.g. 64K, 16M, 1G)')
+    parser.add_argument('--vendor-boot-size', default='64M')
+    parser.add_argument('--ramdisk-compression', default='gzip', choices=RAMDISK_COMPRESSIONS)
+    parser.add_argument('--scatter', default='xml,txt,x', help='comma separated subset of xml, txt, x')
+    parser.add_argument('--country', default='KR', choices=[code for _, code in COUNTRIES], type=str.upper)
+    parser.add_argument('--seed', default=0, type=int)
+    args = parser.parse_args(argv)
+    formats = tuple(item.strip().lower() for item in args.scatter.split(',') if item.strip())
+    unknown = [item for item in formats if item not in SCATTER_FORMATS]
+    if unknown:
+        parser.error(f'unknown scatter format: {", ".join(unknown)}')
+    image_dir = generate_firmware_tree(
+        args.base_dir,
+        platform=args.platform,
+        model=args.model,
+        version=args.version,
+        region=args.region,
+        partitions=args.partitions,
+        image_size=_parse_size(args.image_size),
+        vendor_boot_size=_parse_size(args.vendor_boot_size),
+        ramdisk_compression=args.ramdisk_compression,
+        scatter_formats=formats,
+        country=args.country,
+        seed=args.seed,
+    )
+    print(image_dir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
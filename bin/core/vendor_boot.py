@@ -0,0 +1,319 @@
+from __future__ import annotations
+import struct
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator
+
+VENDOR_BOOT_MAGIC = b'VNDRBOOT'
+VENDOR_RAMDISK_TYPE_NONE = 0
+VENDOR_RAMDISK_TYPE_PLATFORM = 1
+VENDOR_RAMDISK_TYPE_RECOVERY = 2
+VENDOR_RAMDISK_TYPE_DLKM = 3
+_V3_HEADER = struct.Struct('<8sIIIII2048sI16sIIQ')
+_V4_HEADER_EXTRA = struct.Struct('<IIII')
+_RAMDISK_TABLE_ENTRY = struct.Struct('<III32s64s')
+_LZ4_LEGACY_MAGIC = 0x184C2102
+_LZ4_LEGACY_BLOCK_SIZE = 8 << 20
+_CPIO_MAGICS = (b'070701', b'070702')
+_CPIO_HEADER_SIZE = 110
+_CPIO_TRAILER = 'TRAILER!!!'
+_BOOTCONFIG_TRAILER = b'#BOOTCONFIG\n'
+_PROP_FILE_NAMES = {'build.prop', 'default.prop', 'prop.default'}
+_PROP_FILE_MAX_SIZE = 1 << 20
+_READ_CHUNK_SIZE = 1 << 20
+
+
+class VendorRamdisk:
+    __slots__ = ('offset', 'size', 'type', 'name')
+
+    def __init__(self, offset: int, size: int, ramdisk_type: int, name: str) -> None:
+        self.offset = offset
+        self.size = size
+        self.type = ramdisk_type
+        self.name = name
+
+
+class VendorBootLayout:
+    __slots__ = (
+        'header_version', 'page_size', 'ramdisk_offset', 'ramdisk_size', 'dtb_offset', 'dtb_size',
+        'bootconfig_offset', 'bootconfig_size', 'ramdisks',
+    )
+
+    def __init__(self, header_version: int, page_size: int) -> None:
+        self.header_version = header_version
+        self.page_size = page_size
+        self.ramdisk_offset = 0
+        self.ramdisk_size = 0
+        self.dtb_offset = 0
+        self.dtb_size = 0
+        self.bootconfig_offset = 0
+        self.bootconfig_size = 0
+        self.ramdisks: list[VendorRamdisk] = []
+
+
+def _align(value: int, page_size: int) -> int:
+    return (value + page_size - 1) // page_size * page_size
+
+
+def parse_vendor_boot_header(fh: BinaryIO, file_size: int) -> VendorBootLayout | None:
+    fh.seek(0)
+    raw = fh.read(_V3_HEADER.size + _V4_HEADER_EXTRA.size)
+    if len(raw) < _V3_HEADER.size or raw[:8] != VENDOR_BOOT_MAGIC:
+        return None
+    (_magic, header_version, page_size, _kernel_addr, _ramdisk_addr, ramdisk_size,
+     _cmdline, _tags_addr, _name, header_size, dtb_size, _dtb_addr) = _V3_HEADER.unpack_from(raw)
+    if header_version < 3 or page_size <= 0 or page_size & (page_size - 1):
+        return None
+    layout = VendorBootLayout(header_version, page_size)
+    layout.ramdisk_offset = _align(header_size, page_size)
+    layout.ramdisk_size = ramdisk_size
+    layout.dtb_offset = layout.ramdisk_offset + _align(ramdisk_size, page_size)
+    layout.dtb_size = dtb_size
+    table_offset = layout.dtb_offset + _align(dtb_size, page_size)
+    if layout.ramdisk_offset + ramdisk_size > file_size:
+        return None
+    if header_version == 3:
+        layout.ramdisks.append(VendorRamdisk(layout.ramdisk_offset, ramdisk_size, VENDOR_RAMDISK_TYPE_NONE, ''))
+        return layout
+    if len(raw) < _V3_HEADER.size + _V4_HEADER_EXTRA.size:
+        return None
+    table_size, entry_num, entry_size, bootconfig_size = _V4_HEADER_EXTRA.unpack_from(raw, _V3_HEADER.size)
+    layout.bootconfig_offset = table_offset + _align(table_size, page_size)
+    layout.bootconfig_size = bootconfig_size
+    if entry_size < _RAMDISK_TABLE_ENTRY.size or entry_num * entry_size > table_size or table_offset + table_size > file_size:
+        return None
+    fh.seek(table_offset)
+    table = fh.read(table_size)
+    for idx in range(entry_num):
+        size, offset, ramdisk_type, name, _board_id = _RAMDISK_TABLE_ENTRY.unpack_from(table, idx * entry_size)
+        if offset + size > ramdisk_size:
+            return None
+        label = name.split(b'\0', 1)[0].decode('ascii', 'ignore')
+        layout.ramdisks.append(VendorRamdisk(layout.ramdisk_offset + offset, size, ramdisk_type, label))
+    return layout
+
+
+def _read_range(fh: BinaryIO, offset: int, size: int) -> Iterator[bytes]:
+    fh.seek(offset)
+    remaining = size
+    while remaining > 0:
+        chunk = fh.read(min(_READ_CHUNK_SIZE, remaining))
+        if not chunk:
+            return
+        remaining -= len(chunk)
+        yield chunk
+
+
+def _gunzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    decoder = None
+    for chunk in chunks:
+        while chunk:
+            if decoder is None:
+                chunk = chunk.lstrip(b'\0')
+                if not chunk:
+                    break
+                if chunk[:1] != b'\x1f':
+                    return
+                decoder = zlib.decompressobj(31)
+            out = decoder.decompress(chunk, _READ_CHUNK_SIZE)
+            if out:
+                yield out
+            if decoder.eof:
+                chunk = decoder.unused_data
+                decoder = None
+            else:
+                chunk = decoder.unconsumed_tail
+    if decoder is not None:
+        out = decoder.flush()
+        if out:
+            yield out
+
+
+def _lz4_block_decompress_py(src: bytes) -> bytes:
+    dst = bytearray()
+    pos = 0
+    end = len(src)
+    while pos < end:
+        token = src[pos]
+        pos += 1
+        literal = token >> 4
+        if literal == 15:
+            while True:
+                extra = src[pos]
+                pos += 1
+                literal += extra
+                if extra != 255:
+                    break
+        dst += src[pos:pos + literal]
+        pos += literal
+        if pos >= end:
+            break
+        offset = src[pos] | (src[pos + 1] << 8)
+        pos += 2
+        if offset == 0 or offset > len(dst):
+            raise ValueError('invalid lz4 match offset')
+        length = token & 15
+        if length == 15:
+            while True:
+                extra = src[pos]
+                pos += 1
+                length += extra
+                if extra != 255:
+                    break
+        length += 4
+        start = len(dst) - offset
+        if offset >= length:
+            dst += dst[start:start + length]
+        else:
+            pattern = bytes(dst[start:])
+            dst += (pattern * (length // offset + 1))[:length]
+        if len(dst) > _LZ4_LEGACY_BLOCK_SIZE:
+            raise ValueError('lz4 block too large')
+    return bytes(dst)
+
+
+def _lz4_block_decompress(src: bytes) -> bytes:
+    try:
+        import lz4.block
+    except ImportError:
+        return _lz4_block_decompress_py(src)
+    return lz4.block.decompress(src, uncompressed_size=_LZ4_LEGACY_BLOCK_SIZE)
+
+
+def _unlz4_legacy_chunks(fh: BinaryIO, offset: int, size: int) -> Iterator[bytes]:
+    fh.seek(offset)
+    pos = offset
+    end = offset + size
+    while pos + 4 <= end:
+        (value,) = struct.unpack('<I', fh.read(4))
+        pos += 4
+        if value == _LZ4_LEGACY_MAGIC:
+            continue
+        if value == 0 or pos + value > end:
+            return
+        block = fh.read(value)
+        pos += value
+        yield _lz4_block_decompress(block)
+
+
+def _is_prop_file(name: str) -> bool:
+    base = name.rsplit('/', 1)[-1]
+    return base in _PROP_FILE_NAMES or base.endswith('.prop')
+
+
+class _CpioPropReader:
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._skip = 0
+        self._want: tuple[str, int, int] | None = None
+        self.done = False
+        self.files: list[tuple[str, bytes]] = []
+
+    def feed(self, data: bytes) -> None:
+        buf = self._buf
+        buf += data
+        while not self.done:
+            if self._skip:
+                count = min(self._skip, len(buf))
+                del buf[:count]
+                self._skip -= count
+                if self._skip:
+                    return
+                continue
+            if self._want is not None:
+                name, size, pad = self._want
+                if len(buf) < size:
+                    return
+                self.files.append((name, bytes(buf[:size])))
+                del buf[:size]
+                self._want = None
+                self._skip = pad
+                continue
+            while buf[:1] == b'\0':
+                del buf[:4 if buf[:4] == b'\0\0\0\0' else 1]
+            if len(buf) < _CPIO_HEADER_SIZE:
+                return
+            if bytes(buf[:6]) not in _CPIO_MAGICS:
+                self.done = True
+                return
+            try:
+                file_size = int(buf[54:62], 16)
+                name_size = int(buf[94:102], 16)
+            except ValueError:
+                self.done = True
+                return
+            head = _CPIO_HEADER_SIZE + name_size
+            head += -head % 4
+            if len(buf) < head:
+                return
+            name = bytes(buf[_CPIO_HEADER_SIZE:_CPIO_HEADER_SIZE + name_size]).split(b'\0', 1)[0].decode('utf-8', 'replace')
+            del buf[:head]
+            if name == _CPIO_TRAILER:
+                continue
+            pad = -file_size % 4
+            if _is_prop_file(name) and file_size <= _PROP_FILE_MAX_SIZE:
+                self._want = (name, file_size, pad)
+            else:
+                self._skip = file_size + pad
+
+
+def _parse_prop_text(text: str, props: dict[str, str]) -> None:
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line or line.startswith('#') or '=' not in line:
+            continue
+        key, value = line.split('=', 1)
+        props[key.strip()] = value.strip()
+
+
+def _read_bootconfig(fh: BinaryIO, layout: VendorBootLayout, props: dict[str, str]) -> None:
+    if layout.bootconfig_size <= 0:
+        return
+    fh.seek(layout.bootconfig_offset)
+    data = fh.read(layout.bootconfig_size)
+    if data.endswith(_BOOTCONFIG_TRAILER):
+        data = data[:-(len(_BOOTCONFIG_TRAILER) + 8)]
+    for raw in data.decode('utf-8', 'ignore').splitlines():
+        if '=' not in raw:
+            continue
+        key, value = raw.split('=', 1)
+        props.setdefault(key.strip(), value.strip().strip('"'))
+
+
+def _ramdisk_chunks(fh: BinaryIO, ramdisk: VendorRamdisk) -> Iterator[bytes]:
+    fh.seek(ramdisk.offset)
+    magic = fh.read(6)
+    if magic[:2] == b'\x1f\x8b':
+        return _gunzip_chunks(_read_range(fh, ramdisk.offset, ramdisk.size))
+    if magic[:4] == struct.pack('<I', _LZ4_LEGACY_MAGIC):
+        return _unlz4_legacy_chunks(fh, ramdisk.offset, ramdisk.size)
+    if magic in _CPIO_MAGICS:
+        return _read_range(fh, ramdisk.offset, ramdisk.size)
+    return iter(())
+
+
+def read_vendor_boot_props(path: Path, complete: Callable[[dict[str, str]], bool] | None = None) -> dict[str, str] | None:
+    with path.open('rb') as fh:
+        fh.seek(0, 2)
+        layout = parse_vendor_boot_header(fh, fh.tell())
+        if layout is None:
+            return None
+        props: dict[str, str] = {}
+        _read_bootconfig(fh, layout, props)
+        for ramdisk in layout.ramdisks:
+            if complete is not None and complete(props):
+                break
+            if ramdisk.type == VENDOR_RAMDISK_TYPE_DLKM or ramdisk.size <= 0:
+                continue
+            reader = _CpioPropReader()
+            try:
+                for chunk in _ramdisk_chunks(fh, ramdisk):
+                    reader.feed(chunk)
+                    for _name, data in reader.files:
+                        _parse_prop_text(data.decode('utf-8', 'ignore'), props)
+                    reader.files.clear()
+                    if reader.done or (complete is not None and complete(props)):
+                        break
+            except Exception:
+                continue
+    return props
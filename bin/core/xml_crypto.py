@@ -1,6 +1,13 @@
 import hashlib
+import json
+import os
 import struct
 from pathlib import Path
+from .constants import SCATTER_CACHE_DIR
+
+_KEY_CACHE_PATH = SCATTER_CACHE_DIR / 'keys.json'
+_key_cache: dict[str, str] | None = None
+_SIGNATURE = b'\xcf\x06\x05\x04\x03\x02\x01\xfc'
 
 def _pbkdf1(password: str, salt: bytes, out_len: int, iterations: int=1000) -> bytes:
     data = password.encode('utf-8') + salt
@@ -8,17 +15,59 @@ def _pbkdf1(password: str, salt: bytes, out_len: int, iterations: int=1000) -> b
     for _ in range(iterations - 1):
         digest = hashlib.sha256(digest).digest()
     return digest[:out_len]
- 
-def decrypt_scatter_x(path: Path | str) -> bytes:
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+def _load_key_cache() -> dict[str, str]:
+    global _key_cache
+    if _key_cache is None:
+        _key_cache = {}
+        try:
+            data = json.loads(_KEY_CACHE_PATH.read_text(encoding='utf-8'))
+            if isinstance(data, dict):
+                _key_cache = {str(k): str(v) for k, v in data.items()}
+        except Exception:
+            pass
+    return _key_cache
+
+def _derive_key(salt: bytes) -> bytes:
+    cache = _load_key_cache()
+    cached = cache.get(salt.hex())
+    if cached:
+        try:
+            return bytes.fromhex(cached)
+        except ValueError:
+            pass
+    key = _pbkdf1('OSD', salt, 32, 1000)
+    cache[salt.hex()] = key.hex()
+    try:
+        _write_atomic(_KEY_CACHE_PATH, json.dumps(cache, indent=2).encode('utf-8'))
+    except OSError:
+        pass
+    return key
+
+def encrypt_scatter_x(payload: bytes, iv: bytes | None = None, salt: bytes | None = None) -> bytes:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    iv = iv or os.urandom(16)
+    salt = salt or os.urandom(16)
+    plain = struct.pack('<q', len(payload)) + _SIGNATURE + payload + hashlib.sha256(payload).digest()
+    plain += b'\0' * (-len(plain) % 16)
+    cipher = Cipher(algorithms.AES(_pbkdf1('OSD', salt, 32, 1000)), modes.CBC(iv))
+    encryptor = cipher.encryptor()
+    return iv + salt + encryptor.update(plain) + encryptor.finalize()
+
+def _decrypt_scatter_bytes(data: bytes) -> bytes:
     from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-    p = Path(path)
-    data = p.read_bytes()
     if len(data) < 64:
         raise ValueError('invalid scatter.x')
     iv = data[:16]
     salt = data[16:32]
     body = data[32:]
-    key = _pbkdf1('OSD', salt, 32, 1000)
+    key = _derive_key(salt)
     cipher = Cipher(algorithms.AES(key), modes.CBC(iv))
     decryptor = cipher.decryptor()
     plain = decryptor.update(body) + decryptor.finalize()
@@ -26,11 +75,27 @@ def decrypt_scatter_x(path: Path | str) -> bytes:
         raise ValueError('invalid decrypted data')
     size = struct.unpack('<q', plain[:8])[0]
     signature = plain[8:16]
-    expected = b'\xcf\x06\x05\x04\x03\x02\x01\xfc'
-    if signature != expected:
+    if signature != _SIGNATURE:
         raise ValueError('invalid signature')
     payload = plain[16:16 + size]
     digest = plain[16 + size:16 + size + 32]
     if hashlib.sha256(payload).digest() != digest:
         raise ValueError('hash mismatch')
     return payload
+ 
+def decrypt_scatter_x(path: Path | str, use_cache: bool = True) -> bytes:
+    p = Path(path)
+    data = p.read_bytes()
+    if not use_cache:
+        return _decrypt_scatter_bytes(data)
+    cache_path = SCATTER_CACHE_DIR / f'{hashlib.sha256(data).hexdigest()}.xml'
+    try:
+        return cache_path.read_bytes()
+    except OSError:
+        pass
+    payload = _decrypt_scatter_bytes(data)
+    try:
+        _write_atomic(cache_path, payload)
+    except OSError:
+        pass
+    return payload
@@ -0,0 +1,84 @@
+from __future__ import annotations
+import os
+import shutil
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+_COPY_BUFFER_SIZE = 1 << 20
+_MAX_WORKERS = 8
+
+
+def _member_parts(name: str, strip_prefix: tuple[str, ...]) -> tuple[str, ...] | None:
+    parts = tuple(p for p in name.replace('\\', '/').split('/') if p not in ('', '.'))
+    if not parts or '..' in parts or ':' in parts[0]:
+        return None
+    if strip_prefix and parts[:len(strip_prefix)] == strip_prefix:
+        parts = parts[len(strip_prefix):]
+    return parts or None
+
+
+def _file_crc(path: Path) -> int:
+    crc = 0
+    view = memoryview(bytearray(_COPY_BUFFER_SIZE))
+    with path.open('rb') as fh:
+        while True:
+            n = fh.readinto(view)
+            if not n:
+                break
+            crc = zlib.crc32(view[:n], crc)
+    return crc
+
+
+def _is_current(info: zipfile.ZipInfo, target: Path) -> bool:
+    try:
+        if os.stat(target).st_size != info.file_size:
+            return False
+        return _file_crc(target) == info.CRC
+    except OSError:
+        return False
+
+
+def extract_zip(zip_path: Path, dest_dir: Path, strip_prefix: str = '', workers: int | None = None) -> tuple[int, int]:
+    prefix = tuple(p for p in strip_prefix.replace('\\', '/').split('/') if p)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        infos = zf.infolist()
+    members: list[tuple[zipfile.ZipInfo, Path]] = []
+    for info in infos:
+        parts = _member_parts(info.filename, prefix)
+        if parts is None:
+            continue
+        target = dest_dir.joinpath(*parts)
+        if info.is_dir():
+            target.mkdir(parents=True, exist_ok=True)
+        else:
+            members.append((info, target))
+    members.sort(key=lambda item: item[0].file_size, reverse=True)
+    local = threading.local()
+    handles: list[zipfile.ZipFile] = []
+    handles_lock = threading.Lock()
+
+    def _work(item: tuple[zipfile.ZipInfo, Path]) -> bool:
+        info, target = item
+        if _is_current(info, target):
+            return False
+        zf = getattr(local, 'zf', None)
+        if zf is None:
+            zf = local.zf = zipfile.ZipFile(zip_path, 'r')
+            with handles_lock:
+                handles.append(zf)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with zf.open(info) as src, target.open('wb') as dst:
+            shutil.copyfileobj(src, dst, _COPY_BUFFER_SIZE)
+        return True
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers or min(_MAX_WORKERS, os.cpu_count() or 1)) as pool:
+            written = sum(pool.map(_work, members))
+    finally:
+        for zf in handles:
+            zf.close()
+    return written, len(members) - written